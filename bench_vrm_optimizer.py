@@ -0,0 +1,302 @@
+"""Benchmark vrm_optimizer over the repo's avatar/model corpus.
+
+Runs every corpus file under each configuration in a fresh process and
+records wall time, CPU time (including encode workers), peak RSS,
+input/output bytes and a per-texture encode-time breakdown. Results are
+written as JSON; pass a previous run as --baseline to flag regressions.
+
+Example:
+    python bench_vrm_optimizer.py --out bench.json
+    python bench_vrm_optimizer.py --baseline bench.json --threshold 0.15
+    python bench_vrm_optimizer.py public/three-avatar --configs decode-full,decode-reduced
+    python bench_vrm_optimizer.py --configs default,ssim  # fails if ssim output > default
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import PIL
+
+import vrm_optimizer as vo
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CORPUS = ("public/three-avatar", "public/avatar-assets", "public/models")
+
+# Mirrors vrm_optimizer's CLI defaults.
+BASE_SETTINGS = dict(
+    max_size=512,
+    webp_quality=60,
+    thumb_max=512,
+    thumb_quality=45,
+    normal_max=512,
+    normal_quality=70,
+)
+
+SSIM_TARGET = 0.95
+
+# name -> (keyword arguments for the optimizer, encode worker processes)
+CONFIGS = {
+    "default": ({}, 1),
+    "jobs": ({}, os.cpu_count() or 1),
+    "quantize": ({"quantize": True}, 1),
+    "target": ({"target_mb": "half"}, 1),
+    "allocate": ({"target_mb": "half", "allocate": True}, 1),
+    # A typical --target-ssim; must never write more bytes than "default".
+    "ssim": ({"target_ssim": SSIM_TARGET}, 1),
+    # Decode + resize only, at full resolution vs. reduced (JPEG draft + reduce()).
+    "decode-full": ({"decode": "full"}, 1),
+    "decode-reduced": ({"decode": "reduced"}, 1),
+}
+
+# Metrics compared against a baseline; larger is worse for all of them.
+COMPARED = ("wall_s", "cpu_s", "peak_rss_mb", "output_bytes")
+
+
+def find_corpus(roots: list[str]) -> list[Path]:
+    files: list[Path] = []
+    for root in roots:
+        path = (ROOT / root).resolve()
+        if path.is_file():
+            files.append(path)
+            continue
+        files.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() in (".vrm", ".glb")))
+    return files
+
+
+def _cpu_seconds(usage: resource.struct_rusage) -> float:
+    return usage.ru_utime + usage.ru_stime
+
+
+def _decode_textures(path: Path, reduced: bool) -> int:
+    """Decode and resize every embedded image as the encoder would; returns the count."""
+    count = 0
+    with vo.GlbSource(path) as source:
+        gltf = source.gltf
+        for bv_index, (_img_indices, kind) in vo.images_by_view(gltf).items():
+            bv = gltf.bufferViews[bv_index]
+            off = bv.byteOffset or 0
+            raw = bytes(source.bin[off : off + (bv.byteLength or 0)])
+            limit, _quality = vo.settings_for_kind(kind, BASE_SETTINGS)
+            if reduced:
+                vo.resize_to_limit(vo.decode_image(raw, limit), limit)
+            else:
+                # The previous path: native decode, one LANCZOS pass.
+                im = vo.decode_image(raw)
+                scale = min(1.0, limit / max(im.size))
+                if scale < 1.0:
+                    im = im.resize((max(1, round(im.width * scale)), max(1, round(im.height * scale))), vo.Image.LANCZOS)
+            count += 1
+    return count
+
+
+def run_one(path: str, config: str) -> dict:
+    """Optimize one file under one configuration; runs in its own process."""
+    input_path = Path(path)
+    options, jobs = CONFIGS[config]
+    options = dict(options)
+    target = options.pop("target_mb", None)
+    allocate = options.pop("allocate", False)
+    decode = options.pop("decode", None)
+    input_bytes = input_path.stat().st_size
+
+    with vo.GlbSource(input_path) as source:
+        has_images = bool(source.gltf.images)
+    if not has_images and not options.get("quantize"):
+        return {"skipped": "no embedded images"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = Path(tmp) / input_path.name
+        executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        wall0 = time.perf_counter()
+        cpu0 = _cpu_seconds(resource.getrusage(resource.RUSAGE_SELF))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                kwargs = dict(BASE_SETTINGS, executor=executor, **options)
+                if decode is not None:
+                    stats = {"textures": _decode_textures(input_path, decode == "reduced")}
+                elif target is not None:
+                    optimize = vo.optimize_vrm_allocated if allocate else vo.optimize_vrm_to_target
+                    target_mb = input_bytes / 2 / (1024 * 1024)
+                    stats = optimize(input_path, output_path, target_mb=target_mb, **kwargs)
+                else:
+                    # The default config also collects per-texture timings.
+                    on_report = (lambda report: None) if config == "default" else None
+                    stats = vo.optimize_vrm_file(input_path, output_path, on_report=on_report, **kwargs)
+        finally:
+            if executor is not None:
+                executor.shutdown()  # workers must exit to show up in RUSAGE_CHILDREN
+        wall = time.perf_counter() - wall0
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    result = {
+        "wall_s": round(wall, 4),
+        "cpu_s": round(_cpu_seconds(own) - cpu0 + _cpu_seconds(children), 4),
+        # ru_maxrss is KiB on Linux, bytes on macOS.
+        "peak_rss_mb": round(
+            max(own.ru_maxrss, children.ru_maxrss) / (1024 * 1024 if sys.platform == "darwin" else 1024), 1
+        ),
+        "input_bytes": input_bytes,
+        "encodes": stats["textures"],
+    }
+    if "output_bytes" in stats:
+        result["output_bytes"] = stats["output_bytes"]
+    if "report" in stats:
+        result["stages_ms"] = stats["report"]["stages_ms"]
+        result["textures"] = [
+            {k: t.get(k) for k in ("images", "kind", "format", "width", "height", "input_bytes", "output_bytes")}
+            | {"encode_ms": round(sum(t.get(f"{s}_ms", 0.0) for s in ("decode", "resize", "encode")), 3)}
+            for t in stats["report"]["textures"]
+        ]
+    return result
+
+
+def run_suite(files: list[Path], configs: list[str], repeat: int) -> list[dict]:
+    """Run every (file, config) `repeat` times; keep the fastest run of each."""
+    results = []
+    # One process per measurement so peak RSS isn't inherited from earlier runs.
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx, max_tasks_per_child=1) as pool:
+        for path in files:
+            rel = path.relative_to(ROOT).as_posix() if path.is_relative_to(ROOT) else str(path)
+            for config in configs:
+                runs = []
+                for _ in range(repeat):
+                    try:
+                        runs.append(pool.submit(run_one, str(path), config).result())
+                    except BaseException as e:  # SystemExit from the optimizer included
+                        runs.append({"error": f"{type(e).__name__}: {e}"})
+                        break
+                    if "skipped" in runs[-1]:
+                        break
+                best = min(runs, key=lambda r: r.get("wall_s", float("inf")))
+                results.append({"file": rel, "config": config, **best})
+                print(_format_result(results[-1]))
+    return results
+
+
+def _format_result(r: dict) -> str:
+    head = f"{r['file']} [{r['config']}]"
+    if "skipped" in r or "error" in r:
+        return f"{head}: {r.get('skipped') or r.get('error')}"
+    line = f"{head}: {r['wall_s']:.2f}s wall, {r['cpu_s']:.2f}s cpu, {r['peak_rss_mb']:.0f}MB rss"
+    if "output_bytes" in r:
+        line += f", {r['input_bytes'] / 1024:.0f}KB -> {r['output_bytes'] / 1024:.0f}KB"
+    return line
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """Describe every metric that got worse than `baseline` by more than `threshold`."""
+    base = {(r["file"], r["config"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = base.get((r["file"], r["config"]))
+        if old is None:
+            continue
+        for metric in COMPARED:
+            if metric not in r or not old.get(metric):
+                continue
+            change = r[metric] / old[metric] - 1
+            if change > threshold:
+                regressions.append(
+                    f"{r['file']} [{r['config']}] {metric}: {old[metric]} -> {r[metric]} (+{change:.0%})"
+                )
+    return regressions
+
+
+def check_ssim_sizes(results: list[dict]) -> list[str]:
+    """Files whose "ssim" run wrote more bytes than their "default" run."""
+    default = {r["file"]: r.get("output_bytes") for r in results if r["config"] == "default"}
+    larger = []
+    for r in results:
+        if r["config"] != "ssim" or not r.get("output_bytes") or not default.get(r["file"]):
+            continue
+        if r["output_bytes"] > default[r["file"]]:
+            larger.append(f"{r['file']}: default {default[r['file']]} -> ssim {r['output_bytes']} bytes")
+    return larger
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Benchmark vrm_optimizer over the repo's avatar corpus.")
+    p.add_argument(
+        "paths",
+        nargs="*",
+        default=list(DEFAULT_CORPUS),
+        help="Files or directories (relative to the repo) to benchmark (default: the avatar/model corpus).",
+    )
+    p.add_argument(
+        "--configs",
+        default="default,jobs,quantize",
+        help=f"Comma-separated configurations to run, from: {', '.join(CONFIGS)} (default: default,jobs,quantize).",
+    )
+    p.add_argument("--repeat", type=int, default=1, help="Runs per file/config; the fastest is kept (default: 1).")
+    p.add_argument("--out", type=Path, default=Path("bench_output.json"), help="Where to write results JSON.")
+    p.add_argument("--baseline", type=Path, default=None, help="Previous results JSON to compare against.")
+    p.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Relative increase that counts as a regression (default: 0.10 = 10%%).",
+    )
+    args = p.parse_args()
+
+    configs = [c.strip() for c in args.configs.split(",") if c.strip()]
+    unknown = [c for c in configs if c not in CONFIGS]
+    if unknown:
+        p.error(f"unknown config(s): {', '.join(unknown)}")
+
+    files = find_corpus(args.paths)
+    if not files:
+        raise SystemExit("No .vrm/.glb files found.")
+
+    t0 = time.perf_counter()
+    results = run_suite(files, configs, max(1, args.repeat))
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "configs": configs,
+            "repeat": args.repeat,
+            "total_s": round(time.perf_counter() - t0, 2),
+        },
+        "results": results,
+    }
+    args.out.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"\nWrote {len(results)} results for {len(files)} file(s) to {args.out}")
+
+    larger = check_ssim_sizes(results)
+    for line in larger:
+        print(f"SSIM LARGER (target {SSIM_TARGET})", line)
+    if larger:
+        print(f"{len(larger)} file(s) got larger with --target-ssim {SSIM_TARGET} than with the defaults.")
+        return 1
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}.")
+            return 1
+        print(f"No regressions above {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
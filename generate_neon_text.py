@@ -9,163 +9,325 @@ Why this approach:
 
 Dependencies (install yourself):
   pip install trimesh numpy shapely fonttools mapbox-earcut tqdm
+  pip install scipy   # not imported here; trimesh's fix_normals needs it
+  pip install pillow  # only for --sdf
 
 Notes:
 - `trimesh.creation.extrude_polygon` triangulates via shapely + earcut.
 - Works best with a bold font like Orbitron-Bold.
+- `--instanced` writes one shared glyph library per font plus a small
+  placement .json per text, so repeated letters ship (and render) once.
+- `--bundle` writes every text of a font into one GLB of named nodes.
+- `--sdf` skips geometry and writes a signed-distance-field glyph atlas
+  (image + JSON metrics) per font for face-on signs drawn as quads.
+- Runs are incremental: `.neon_manifest.json` in --out-dir records each
+  output's font hash, text and settings, so unchanged outputs are skipped
+  (use --force to rebuild everything). Outputs no requested job produces
+  any more are listed; --prune deletes them.
 """
 
 from __future__ import annotations
 
 import argparse
+import functools
+import hashlib
+import json
 import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Callable, Iterable, Iterator, List, Tuple
 
 import numpy as np
+import shapely
 import trimesh
 from fontTools.pens.basePen import BasePen
+from fontTools.pens.boundsPen import BoundsPen
 from fontTools.ttLib import TTFont
 from shapely.geometry import MultiPolygon, Polygon
-from shapely.ops import unary_union
 from tqdm import tqdm
 
 
 LOGGER = logging.getLogger("generate_neon_text")
 
+FONT_SUFFIXES = (".ttf", ".otf")
+# Part of every build key: bump when output geometry or file formats change.
+GENERATOR_VERSION = "4"
+BUILD_MANIFEST = ".neon_manifest.json"
+GLYPH_LIBRARY = "glyphs.glb"
+SIGN_BUNDLE = "signs.glb"
+SIGN_INDEX = "signs.json"
+SDF_ATLAS = "sdf"  # sdf.png / sdf.webp + sdf.json
+SDF_CHARSET = "".join(chr(c) for c in range(0x20, 0x7F))  # printable ASCII
+SDF_GAP = 1  # px between atlas cells
+SDF_CHUNK = 256  # outline segments per distance pass
+LOD_MANIFEST = "lods.json"
+
+
+# Chord tolerance in scene units: how far a flattened curve may stray from
+# the true outline. 0.002 is invisible at the default 1.0 text height.
+DEFAULT_TOLERANCE = 0.002
+MAX_CURVE_SEGMENTS = 64
+
+
+def _segments_for(second_diff: float, tolerance: float) -> int:
+    """Uniform segments keeping a curve with |B''| <= second_diff within tolerance.
+
+    A chord over a parameter step h deviates at most |B''| * h**2 / 8.
+    """
+    if second_diff <= 0.0:
+        return 1
+    n = int(np.ceil(np.sqrt(second_diff / (8.0 * tolerance))))
+    return min(max(n, 1), MAX_CURVE_SEGMENTS)
+
 
 class _ContourPen(BasePen):
-    """Collect contours as lists of points from fontTools glyph drawing."""
+    """Collect contours as (N, 2) float arrays from fontTools glyph drawing.
+
+    Curves are flattened with as few segments as keep them within
+    `tolerance` (font units) of the true outline.
+    """
 
-    def __init__(self, glyph_set):
+    def __init__(self, glyph_set, tolerance: float):
         super().__init__(glyph_set)
-        self.contours: List[List[Tuple[float, float]]] = []
-        self._current: List[Tuple[float, float]] = []
+        self.tolerance = float(tolerance)
+        self.contours: List[np.ndarray] = []
+        self._current: List[np.ndarray] = []
 
     def _moveTo(self, p0):
-        self._current = [(float(p0[0]), float(p0[1]))]
+        self._current = [np.array([p0], dtype=np.float64)]
 
     def _lineTo(self, p1):
-        self._current.append((float(p1[0]), float(p1[1])))
+        self._current.append(np.array([p1], dtype=np.float64))
 
     def _qCurveToOne(self, p1, p2):
-        # Approximate quadratic curves with a polyline.
-        # Keep segments modest to avoid heavy meshes.
-        x0, y0 = self._current[-1]
-        x1, y1 = float(p1[0]), float(p1[1])
-        x2, y2 = float(p2[0]), float(p2[1])
-        for t in np.linspace(0.0, 1.0, 10)[1:]:
-            xt = (1 - t) ** 2 * x0 + 2 * (1 - t) * t * x1 + t**2 * x2
-            yt = (1 - t) ** 2 * y0 + 2 * (1 - t) * t * y1 + t**2 * y2
-            self._current.append((float(xt), float(yt)))
+        ctrl = np.array([self._getCurrentPoint(), p1, p2], dtype=np.float64)
+        # B'' = 2 * (P0 - 2 P1 + P2), constant along the curve.
+        d2 = 2.0 * np.hypot(*(ctrl[0] - 2 * ctrl[1] + ctrl[2]))
+        t = np.linspace(0.0, 1.0, _segments_for(d2, self.tolerance) + 1)[1:, None]
+        mt = 1.0 - t
+        self._current.append(mt**2 * ctrl[0] + 2 * mt * t * ctrl[1] + t**2 * ctrl[2])
 
     def _curveToOne(self, p1, p2, p3):
-        # Approximate cubic curves with a polyline.
-        x0, y0 = self._current[-1]
-        x1, y1 = float(p1[0]), float(p1[1])
-        x2, y2 = float(p2[0]), float(p2[1])
-        x3, y3 = float(p3[0]), float(p3[1])
-        for t in np.linspace(0.0, 1.0, 14)[1:]:
-            xt = (
-                (1 - t) ** 3 * x0
-                + 3 * (1 - t) ** 2 * t * x1
-                + 3 * (1 - t) * t**2 * x2
-                + t**3 * x3
-            )
-            yt = (
-                (1 - t) ** 3 * y0
-                + 3 * (1 - t) ** 2 * t * y1
-                + 3 * (1 - t) * t**2 * y2
-                + t**3 * y3
-            )
-            self._current.append((float(xt), float(yt)))
+        ctrl = np.array([self._getCurrentPoint(), p1, p2, p3], dtype=np.float64)
+        # |B''| peaks at an end point: 6 * max(|P0 - 2 P1 + P2|, |P1 - 2 P2 + P3|).
+        d2 = 6.0 * max(
+            np.hypot(*(ctrl[0] - 2 * ctrl[1] + ctrl[2])),
+            np.hypot(*(ctrl[1] - 2 * ctrl[2] + ctrl[3])),
+        )
+        t = np.linspace(0.0, 1.0, _segments_for(d2, self.tolerance) + 1)[1:, None]
+        mt = 1.0 - t
+        self._current.append(
+            mt**3 * ctrl[0] + 3 * mt**2 * t * ctrl[1] + 3 * mt * t**2 * ctrl[2] + t**3 * ctrl[3]
+        )
 
     def _closePath(self):
-        if len(self._current) >= 3:
-            if self._current[0] != self._current[-1]:
-                self._current.append(self._current[0])
-            self.contours.append(self._current)
+        if self._current:
+            contour = np.concatenate(self._current)
+            if len(contour) >= 3:
+                if not np.array_equal(contour[0], contour[-1]):
+                    contour = np.vstack([contour, contour[:1]])
+                self.contours.append(contour)
         self._current = []
 
 
-def _polygons_from_text(font_path: Path, text: str) -> Polygon | MultiPolygon:
-    """Convert a string into a shapely Polygon/MultiPolygon in font units."""
-    tt = TTFont(str(font_path))
-    glyph_set = tt.getGlyphSet()
+class _FontGlyphs:
+    """A parsed font plus its glyph outlines, each flattened and validated once."""
 
-    cmap = tt.getBestCmap()
-    if cmap is None:
-        raise RuntimeError("Font has no cmap")
+    def __init__(self, font_path: Path):
+        self.tt = TTFont(str(font_path))
+        self.glyph_set = self.tt.getGlyphSet()
+        self.cmap = self.tt.getBestCmap()
+        if self.cmap is None:
+            raise RuntimeError("Font has no cmap")
+        self.units_per_em = int(self.tt["head"].unitsPerEm)
+        self._polygons: dict[Tuple[str, float], List[Polygon]] = {}
+        self._bounds: dict[str, Tuple[float, float, float, float] | None] = {}
 
-    units_per_em = int(tt["head"].unitsPerEm)
+    def advance(self, glyph_name: str) -> float:
+        # Attempt to get horizontal advance (fallback to em).
+        try:
+            return float(self.tt["hmtx"].metrics[glyph_name][0])
+        except Exception:
+            return float(self.units_per_em)
 
-    x_cursor = 0.0
-    all_polys: List[Polygon] = []
+    def bounds(self, glyph_name: str) -> Tuple[float, float, float, float] | None:
+        """Exact outline bounds in font units (None for blank glyphs)."""
+        if glyph_name not in self._bounds:
+            pen = BoundsPen(self.glyph_set)
+            self.glyph_set[glyph_name].draw(pen)
+            self._bounds[glyph_name] = pen.bounds
+        return self._bounds[glyph_name]
 
-    for ch in text:
-        codepoint = ord(ch)
-        glyph_name = cmap.get(codepoint)
-        if not glyph_name:
-            LOGGER.warning("No glyph for character %r (U+%04X)", ch, codepoint)
-            continue
+    def polygons(self, glyph_name: str, tolerance: float) -> List[Polygon]:
+        """Valid polygons of one glyph at the origin, flattened to `tolerance` font units."""
+        key = (glyph_name, tolerance)
+        cached = self._polygons.get(key)
+        if cached is not None:
+            return cached
 
-        glyph = glyph_set[glyph_name]
-        pen = _ContourPen(glyph_set)
-        glyph.draw(pen)
+        pen = _ContourPen(self.glyph_set, tolerance)
+        self.glyph_set[glyph_name].draw(pen)
+        contours = [c for c in pen.contours if len(c) >= 4]
+        if not contours:
+            self._polygons[key] = []
+            return []
 
-        # Attempt to get horizontal advance (fallback to em).
-        try:
-            hmtx = tt["hmtx"].metrics[glyph_name]
-            advance = float(hmtx[0])
-        except Exception:
-            advance = float(units_per_em)
+        # All contours of the glyph in one pass: rings, fill direction, validity, area.
+        ring_ids = np.repeat(np.arange(len(contours)), [len(c) for c in contours])
+        rings = shapely.linearrings(np.concatenate(contours), indices=ring_ids)
+        ccw = shapely.is_ccw(rings)
+        polys = shapely.polygons(rings)
+        invalid = ~shapely.is_valid(polys)
+        polys[invalid] = shapely.buffer(polys[invalid], 0)
+        areas = shapely.area(polys)
 
-        for contour in pen.contours:
-            pts = np.array(contour, dtype=np.float64)
-            pts[:, 0] += x_cursor
+        # Nonzero fill: contours wound like the largest one add area, the
+        # others cut counters (the holes in O, A, D...). Largest first, so an
+        # island inside a counter is added back after the counter is cut.
+        order = [i for i in np.argsort(-areas, kind="stable") if areas[i] >= 1.0]
+        glyph = Polygon()
+        for i in order:
+            if ccw[i] == ccw[order[0]]:
+                glyph = glyph.union(polys[i])
+            else:
+                glyph = glyph.difference(polys[i])
+        parts = shapely.get_parts(glyph)
+        polys = [p for p in parts if isinstance(p, Polygon) and p.area >= 1.0]
+        self._polygons[key] = polys
+        return polys
 
-            poly = Polygon(pts)
-            if not poly.is_valid:
-                poly = poly.buffer(0)
-            if poly.is_empty:
-                continue
-            if poly.area < 1.0:
+    def cap_height(self) -> float:
+        """Capital letter height in font units; instanced signs scale by it."""
+        os2 = self.tt["OS/2"] if "OS/2" in self.tt else None
+        if os2 is not None and getattr(os2, "sCapHeight", 0) > 0:
+            return float(os2.sCapHeight)
+        name = self.cmap.get(ord("H"))
+        box = self.bounds(name) if name else None
+        return float(box[3] - box[1]) if box else 0.7 * self.units_per_em
+
+    def layout(self, text: str) -> List[Tuple[str, float]]:
+        """(glyph name, x offset in font units) for each character of `text` the font has."""
+        placed: List[Tuple[str, float]] = []
+        x_cursor = 0.0
+        for ch in text:
+            codepoint = ord(ch)
+            glyph_name = self.cmap.get(codepoint)
+            if not glyph_name:
+                LOGGER.warning("No glyph for character %r (U+%04X)", ch, codepoint)
                 continue
-            all_polys.append(poly)
+            placed.append((glyph_name, x_cursor))
+            x_cursor += self.advance(glyph_name)
+        return placed
+
 
-        x_cursor += advance
+@functools.lru_cache(maxsize=None)
+def _load_font(font_path: Path) -> _FontGlyphs:
+    """Parse a font once per process; later texts reuse its glyph cache."""
+    return _FontGlyphs(font_path)
 
-    if not all_polys:
+
+def _font_tolerance(font_path: Path, text: str, tolerance: float, text_height: float) -> float:
+    """Convert a scene-unit chord tolerance to font units for `text` scaled to `text_height`.
+
+    Snapped down to a power of two: never coarser than asked, and texts of
+    similar height share glyph cache keys instead of each flattening again.
+    """
+    font = _load_font(Path(font_path).resolve())
+    boxes = [font.bounds(name) for name in map(font.cmap.get, map(ord, text)) if name]
+    boxes = [b for b in boxes if b is not None]
+    height = (max(b[3] for b in boxes) - min(b[1] for b in boxes)) if boxes else font.units_per_em
+    return 2.0 ** math.floor(math.log2(tolerance * max(height, 1e-9) / text_height))
+
+
+def _polygons_from_text(font_path: Path, text: str, tolerance: float) -> Polygon | MultiPolygon:
+    """Convert a string into a shapely Polygon/MultiPolygon in font units.
+
+    Curves are flattened to within `tolerance` font units (see `_font_tolerance`).
+    """
+    font = _load_font(Path(font_path).resolve())
+
+    glyph_polys: List[Polygon] = []
+    x_offsets: List[float] = []
+    for glyph_name, x_offset in font.layout(text):
+        polys = font.polygons(glyph_name, tolerance)
+        glyph_polys.extend(polys)
+        x_offsets.extend([x_offset] * len(polys))
+
+    if not glyph_polys:
         raise RuntimeError(f"No polygons generated for text: {text!r}")
 
-    merged = unary_union(all_polys)
+    # Place every cached glyph polygon in one transform over all coordinates.
+    geoms = np.array(glyph_polys, dtype=object)
+    shift = np.repeat(x_offsets, shapely.get_num_coordinates(geoms))
+    placed = shapely.transform(geoms, lambda coords: coords + np.c_[shift, np.zeros_like(shift)])
+
+    merged = _union_touching(placed)
     if merged.is_empty:
         raise RuntimeError(f"Union produced empty geometry for text: {text!r}")
     return merged
 
 
+def _union_touching(geoms: np.ndarray) -> Polygon | MultiPolygon:
+    """Same area as union_all(geoms), but only unions polygons that intersect.
+
+    Each glyph's polygons are already disjoint, so most of a long string
+    passes straight through and only kerned/joined letters get unioned.
+    """
+    left, right = shapely.STRtree(geoms).query(geoms, predicate="intersects")
+    parent = list(range(len(geoms)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(left[left < right].tolist(), right[left < right].tolist()):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    groups: dict[int, List[int]] = {}
+    for i in range(len(geoms)):
+        groups.setdefault(find(i), []).append(i)
+    if len(groups) == 1:
+        return shapely.union_all(geoms)
+    parts = [geoms[g[0]] if len(g) == 1 else shapely.union_all(geoms[g]) for g in groups.values()]
+    return MultiPolygon(list(shapely.get_parts(parts)))
+
+
 def _normalize_to_height(poly: Polygon | MultiPolygon, target_height: float) -> Polygon | MultiPolygon:
     minx, miny, maxx, maxy = poly.bounds
     height = max(1e-9, (maxy - miny))
     scale = target_height / height
-    scaled = trimesh.transformations.scale_matrix(scale)  # 4x4
-
-    def _apply(p: Polygon) -> Polygon:
-        pts = np.asarray(p.exterior.coords)
-        pts3 = np.c_[pts[:, 0], pts[:, 1], np.zeros(len(pts)), np.ones(len(pts))]
-        out = (scaled @ pts3.T).T
-        exterior = [(float(x), float(y)) for x, y in out[:, :2]]
-        holes = []
-        for ring in p.interiors:
-            hpts = np.asarray(ring.coords)
-            hpts3 = np.c_[hpts[:, 0], hpts[:, 1], np.zeros(len(hpts)), np.ones(len(hpts))]
-            hout = (scaled @ hpts3.T).T
-            holes.append([(float(x), float(y)) for x, y in hout[:, :2]])
-        return Polygon(exterior, holes)
+    return shapely.transform(poly, lambda coords: coords * scale)
 
+
+def _extrude(poly: Polygon | MultiPolygon | List[Polygon], depth: float) -> trimesh.Trimesh:
+    # `extrude_polygon` takes a single shapely Polygon; extrude each part.
     if isinstance(poly, Polygon):
-        return _apply(poly)
-    return MultiPolygon([_apply(p) for p in poly.geoms])
+        parts = [poly]
+    else:
+        parts = list(poly.geoms) if isinstance(poly, MultiPolygon) else list(poly)
+    mesh = trimesh.util.concatenate([trimesh.creation.extrude_polygon(p, height=depth) for p in parts])
+    mesh.merge_vertices()
+    mesh.update_faces(mesh.unique_faces())
+    mesh.update_faces(mesh.nondegenerate_faces())
+    mesh.remove_unreferenced_vertices()
+    mesh.fix_normals()
+    return mesh
+
+
+def _text_outline(font_path: Path, text: str, text_height: float, tolerance: float) -> Polygon | MultiPolygon:
+    """`text` as one outline scaled to `text_height`, curves within `tolerance` scene units."""
+    poly = _polygons_from_text(font_path, text, _font_tolerance(font_path, text, tolerance, text_height))
+    return _normalize_to_height(poly, target_height=text_height)
+
+
+def _lod_path(out_path: Path, level: int) -> Path:
+    return out_path if level == 0 else out_path.with_name(f"{out_path.stem}_lod{level}{out_path.suffix}")
 
 
 def extrude_text_to_glb(
@@ -176,24 +338,306 @@ def extrude_text_to_glb(
     text_height: float,
     extrude_depth: float,
     center: bool = True,
-) -> None:
+    tolerance: float = DEFAULT_TOLERANCE,
+    lod_tolerances: Tuple[float, ...] = (),
+) -> List[dict]:
+    """Write `out_path` (LOD0) plus `<stem>_lod<N>.glb` for each of `lod_tolerances`.
+
+    Lower levels simplify the normalized outline by their tolerance (scene
+    units) before extrusion, preserving topology so counters survive, and
+    share LOD0's centering so they line up. Returns one entry per level,
+    recording the curve-flattening and simplification tolerances separately
+    (LOD0 is not simplified, so its simplify_tolerance is 0).
+    """
     LOGGER.info("Generating %s -> %s", text, out_path.as_posix())
-    poly = _polygons_from_text(font_path, text)
-    poly = _normalize_to_height(poly, target_height=text_height)
+    poly = _text_outline(font_path, text, text_height, tolerance)
+    mesh = _extrude(poly, extrude_depth)
+    offset = -mesh.bounding_box.centroid if center else np.zeros(3)
 
-    # `extrude_polygon` expects a shapely Polygon or MultiPolygon.
-    mesh = trimesh.creation.extrude_polygon(poly, height=extrude_depth)
-    mesh.remove_duplicate_faces()
-    mesh.remove_degenerate_faces()
-    mesh.remove_unreferenced_vertices()
-    mesh.fix_normals()
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    levels: List[dict] = []
+    for level, lod_tolerance in enumerate((0.0, *lod_tolerances)):
+        if level:
+            mesh = _extrude(poly.simplify(lod_tolerance, preserve_topology=True), extrude_depth)
+        mesh.apply_translation(offset)
+        path = _lod_path(out_path, level)
+        mesh.export(path)
+        LOGGER.info("Wrote %s (verts=%d faces=%d)", path.as_posix(), len(mesh.vertices), len(mesh.faces))
+        levels.append(
+            {
+                "level": level,
+                "file": path.name,
+                "curve_tolerance": tolerance,
+                "simplify_tolerance": lod_tolerance,
+                "triangles": len(mesh.faces),
+                "vertices": len(mesh.vertices),
+            }
+        )
+    return levels
 
-    if center:
-        mesh.apply_translation(-mesh.bounding_box.centroid)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    mesh.export(out_path)
-    LOGGER.info("Wrote %s (verts=%d faces=%d)", out_path.as_posix(), len(mesh.vertices), len(mesh.faces))
+def write_instanced_signs(
+    *,
+    font_path: Path,
+    texts: List[str],
+    out_dir: Path,
+    text_height: float,
+    extrude_depth: float,
+    center: bool = True,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """Write one shared glyph-library GLB for the font plus a placement list per sign.
+
+    Every glyph used by `texts` is extruded once into GLYPH_LIBRARY as a mesh
+    (and node) named after the glyph, with its origin at the pen position.
+    Each sign becomes `<text>.json`: the glyph translations grouped by glyph,
+    ready for instancing. Glyphs share one scale, so `text_height` is the
+    font's cap height here rather than each text's own bounds. Returns the
+    texts that failed.
+    """
+    font = _load_font(Path(font_path).resolve())
+    scale = text_height / font.cap_height()
+    font_tolerance = tolerance / scale
+
+    failed: List[str] = []
+    layouts = {}
+    for text in texts:
+        placed = [(name, x) for name, x in font.layout(text) if font.polygons(name, font_tolerance)]
+        if placed:
+            layouts[text] = placed
+        else:
+            failed.append(text)
+            LOGGER.error("No polygons generated for text: %r", text)
+
+    scene = trimesh.Scene()
+    meshes = {}
+    for name in dict.fromkeys(n for placed in layouts.values() for n, _x in placed):
+        polys = shapely.transform(np.array(font.polygons(name, font_tolerance), dtype=object), lambda c: c * scale)
+        meshes[name] = _extrude(polys, extrude_depth)
+        scene.add_geometry(meshes[name], geom_name=name, node_name=name)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    library = out_dir / GLYPH_LIBRARY
+    scene.export(library)
+    LOGGER.info(
+        "Wrote %s (%d glyphs, faces=%d)",
+        library.as_posix(),
+        len(meshes),
+        sum(len(m.faces) for m in meshes.values()),
+    )
+
+    for text, placed in layouts.items():
+        out_path = out_dir / f"{text.lower()}.json"
+        try:
+            lo = np.min([meshes[n].bounds[0] + (x * scale, 0, 0) for n, x in placed], axis=0)
+            hi = np.max([meshes[n].bounds[1] + (x * scale, 0, 0) for n, x in placed], axis=0)
+            offset = -(lo + hi) / 2 if center else np.zeros(3)
+            instances: dict[str, List[List[float]]] = {}
+            for name, x in placed:
+                translation = np.array([x * scale, 0.0, 0.0]) + offset
+                instances.setdefault(name, []).append([round(float(v), 6) for v in translation])
+            sign = {
+                "library": GLYPH_LIBRARY,
+                "text": text,
+                "bounds": [[round(float(v), 6) for v in lo + offset], [round(float(v), 6) for v in hi + offset]],
+                "instances": instances,
+            }
+            out_path.write_text(json.dumps(sign, separators=(",", ":")) + "\n", encoding="utf-8")
+            LOGGER.info("Wrote %s (%d glyph instances)", out_path.as_posix(), len(placed))
+        except Exception:
+            failed.append(text)
+            LOGGER.exception("Failed to generate %s", text)
+    return failed
+
+
+def write_sign_bundle(
+    *,
+    font_path: Path,
+    texts: List[str],
+    out_dir: Path,
+    text_height: float,
+    extrude_depth: float,
+    center: bool = True,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """Write every text of one font into a single SIGN_BUNDLE plus a SIGN_INDEX.
+
+    Each text is a mesh and a node named after the text (meshes share the
+    GLB's one buffer), built exactly like its standalone `<text>.glb`. The
+    index maps node names to bounds and triangle counts so a client can
+    fetch one file and pick signs out by name. Returns the texts that failed.
+    """
+    scene = trimesh.Scene()
+    index: dict[str, dict] = {}
+    failed: List[str] = []
+    for text in dict.fromkeys(texts):
+        try:
+            mesh = _extrude(_text_outline(font_path, text, text_height, tolerance), extrude_depth)
+        except Exception:
+            failed.append(text)
+            LOGGER.exception("Failed to generate %s", text)
+            continue
+        if center:
+            mesh.apply_translation(-mesh.bounding_box.centroid)
+        scene.add_geometry(mesh, geom_name=text, node_name=text)
+        index[text] = {
+            "node": text,
+            "bounds": [[round(float(v), 6) for v in corner] for corner in mesh.bounds],
+            "triangles": len(mesh.faces),
+        }
+    if not index:
+        return failed
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    bundle = out_dir / SIGN_BUNDLE
+    scene.export(bundle)
+    (out_dir / SIGN_INDEX).write_text(
+        json.dumps({"file": SIGN_BUNDLE, "signs": index}, indent=2) + "\n", encoding="utf-8"
+    )
+    LOGGER.info("Wrote %s (%d signs) and %s", bundle.as_posix(), len(index), SIGN_INDEX)
+    return failed
+
+
+def _glyph_sdf(polys: List[Polygon], left: float, top: float, width: int, height: int, px: float, spread: float):
+    """Signed distance field of `polys` sampled at pixel centers, as uint8.
+
+    The cell's top-left corner is (`left`, `top`) in font units and each
+    pixel is `px` font units; 128 is the outline, 255 is `spread` px inside.
+    """
+    xs = left + (np.arange(width) + 0.5) * px
+    ys = top - (np.arange(height) + 0.5) * px
+    gx, gy = np.meshgrid(xs, ys)
+    pts = np.c_[gx.ravel(), gy.ravel()]
+
+    rings = shapely.get_rings(polys)
+    coords = [shapely.get_coordinates(r) for r in rings]
+    a = np.concatenate([c[:-1] for c in coords])
+    ab = np.concatenate([c[1:] for c in coords]) - a
+    ab_len2 = np.maximum((ab**2).sum(axis=1), 1e-12)
+
+    # Distance to the nearest outline segment, a chunk of segments at a time.
+    best = np.full(len(pts), np.inf)
+    for i in range(0, len(a), SDF_CHUNK):
+        sa, sab, sl = a[i : i + SDF_CHUNK], ab[i : i + SDF_CHUNK], ab_len2[i : i + SDF_CHUNK]
+        ap = pts[:, None, :] - sa[None, :, :]
+        t = np.clip((ap * sab[None]).sum(axis=2) / sl[None], 0.0, 1.0)
+        d2 = ((ap - t[..., None] * sab[None]) ** 2).sum(axis=2)
+        best = np.minimum(best, d2.min(axis=1))
+
+    inside = shapely.contains_xy(MultiPolygon(polys), pts[:, 0], pts[:, 1])
+    signed = np.where(inside, 1.0, -1.0) * np.sqrt(best) / px
+    field = np.clip(0.5 + signed / (2.0 * spread), 0.0, 1.0)
+    return np.round(field * 255).astype(np.uint8).reshape(height, width)
+
+
+def _pack_shelves(sizes: List[Tuple[int, int]], gap: int) -> Tuple[List[Tuple[int, int]], int, int]:
+    """Shelf-pack (w, h) cells tallest first; returns positions and the power-of-two atlas size."""
+    area = sum((w + gap) * (h + gap) for w, h in sizes)
+    width = 64
+    while width * width < area * 1.3 or width < max((w + gap for w, _h in sizes), default=0):
+        width *= 2
+    positions: List[Tuple[int, int]] = [(0, 0)] * len(sizes)
+    x = y = shelf = 0
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        w, h = sizes[i]
+        if x + w > width:
+            x, y, shelf = 0, y + shelf + gap, 0
+        positions[i] = (x, y)
+        x += w + gap
+        shelf = max(shelf, h)
+    height = 64
+    while height < y + shelf:
+        height *= 2
+    return positions, width, height
+
+
+def write_sdf_atlas(
+    *,
+    font_path: Path,
+    texts: List[str],
+    out_dir: Path,
+    em_size: int = 48,
+    spread: float = 6.0,
+    image_format: str = "png",
+    charset: str = SDF_CHARSET,
+) -> List[str]:
+    """Write an SDF glyph atlas (`sdf.<format>`) and its metrics (`sdf.json`) for one font.
+
+    Covers `charset` plus every character of `texts`. Outlines come from
+    the same cached `_ContourPen` polygons as the extruded meshes, flattened
+    to a tenth of a pixel. Metrics are in em units (advance, cell bearing and
+    size) with UV rects measured from the image's top-left. Returns the texts
+    the font has no glyphs for at all.
+    """
+    from PIL import Image
+
+    font = _load_font(Path(font_path).resolve())
+    upm = float(font.units_per_em)
+    px = upm / em_size
+    pad = int(np.ceil(spread))
+    chars = "".join(dict.fromkeys(charset + "".join(texts)))
+
+    glyphs: List[dict] = []
+    cells: List[np.ndarray] = []
+    for ch in chars:
+        name = font.cmap.get(ord(ch))
+        if not name:
+            continue
+        entry = {"char": ch, "codepoint": ord(ch), "glyph": name, "advance": round(font.advance(name) / upm, 6)}
+        polys = font.polygons(name, px * 0.1)
+        if polys:
+            minx, miny, maxx, maxy = MultiPolygon(polys).bounds
+            width = int(np.ceil((maxx - minx) / px)) + 2 * pad
+            height = int(np.ceil((maxy - miny) / px)) + 2 * pad
+            left, top = minx - pad * px, maxy + pad * px
+            cells.append(_glyph_sdf(polys, left, top, width, height, px, spread))
+            entry["bearing"] = [round(left / upm, 6), round(top / upm, 6)]
+            entry["size"] = [round(width * px / upm, 6), round(height * px / upm, 6)]
+        glyphs.append(entry)
+
+    positions, atlas_w, atlas_h = _pack_shelves([(c.shape[1], c.shape[0]) for c in cells], SDF_GAP)
+    atlas = np.zeros((atlas_h, atlas_w), dtype=np.uint8)
+    drawn = (g for g in glyphs if "size" in g)
+    for cell, (x, y), entry in zip(cells, positions, drawn):
+        h, w = cell.shape
+        atlas[y : y + h, x : x + w] = cell
+        entry["rect"] = [x, y, w, h]
+        entry["uv"] = [
+            round(x / atlas_w, 6),
+            round(y / atlas_h, 6),
+            round((x + w) / atlas_w, 6),
+            round((y + h) / atlas_h, 6),
+        ]
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    image_path = out_dir / f"{SDF_ATLAS}.{image_format}"
+    save_args = {"lossless": True, "method": 6} if image_format == "webp" else {"optimize": True}
+    Image.fromarray(atlas, mode="L").save(image_path, **save_args)
+
+    hhea = font.tt["hhea"] if "hhea" in font.tt else None
+    metrics = {
+        "image": image_path.name,
+        "width": atlas_w,
+        "height": atlas_h,
+        "emSize": em_size,
+        "distanceRange": 2 * spread,
+        "unitsPerEm": int(upm),
+        "ascender": round(hhea.ascent / upm, 6) if hhea else None,
+        "descender": round(hhea.descent / upm, 6) if hhea else None,
+        "lineHeight": round((hhea.ascent - hhea.descent + hhea.lineGap) / upm, 6) if hhea else None,
+        "capHeight": round(font.cap_height() / upm, 6),
+        "glyphs": glyphs,
+    }
+    (out_dir / f"{SDF_ATLAS}.json").write_text(json.dumps(metrics, indent=2) + "\n", encoding="utf-8")
+    LOGGER.info("Wrote %s (%dx%d, %d glyphs)", image_path.as_posix(), atlas_w, atlas_h, len(cells))
+
+    failed: List[str] = []
+    for text in texts:
+        lacking = "".join(ch for ch in text if ord(ch) not in font.cmap)
+        if lacking:
+            LOGGER.warning("Font %s has no glyph for %r in %r", Path(font_path).name, lacking, text)
+        if len(lacking) == len(text):
+            failed.append(text)
+    return failed
 
 
 def _default_texts() -> List[str]:
@@ -213,13 +657,123 @@ def _existing_font_default() -> Path | None:
     return None
 
 
+def _font_paths(fonts: List[Path], fonts_dir: Path | None) -> List[Path]:
+    paths = list(fonts)
+    if fonts_dir is not None:
+        paths += sorted(p for p in fonts_dir.iterdir() if p.suffix.lower() in FONT_SUFFIXES)
+    return list(dict.fromkeys(paths))
+
+
+def _parse_lods(spec: str) -> Tuple[float, ...]:
+    """Parse "0.01,0.03,0.08" into increasing simplification tolerances for LOD1..N."""
+    try:
+        values = tuple(float(v) for v in spec.split(",") if v.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated numbers, got {spec!r}") from None
+    if not values or any(v <= 0 for v in values) or list(values) != sorted(set(values)):
+        raise argparse.ArgumentTypeError("LOD tolerances must be positive and strictly increasing")
+    return values
+
+
+def _write_lod_manifest(out_dir: Path, entries: dict, drop: Iterable[str] = ()) -> Path:
+    """Merge {text: levels} into out_dir/LOD_MANIFEST, keeping entries from earlier runs except `drop`."""
+    path = out_dir / LOD_MANIFEST
+    manifest = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    for text in drop:
+        manifest.pop(text, None)
+    manifest.update(entries)
+    path.write_text(json.dumps(dict(sorted(manifest.items())), indent=2) + "\n", encoding="utf-8")
+    return path
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _expected_outputs(item: dict, mode: str, settings: dict) -> List[Path]:
+    """Files one job writes; the first one identifies the job in the build manifest."""
+    if mode == "glb":
+        return [_lod_path(item["out_path"], level) for level in range(len(settings["lod_tolerances"]) + 1)]
+    out_dir = item["out_dir"]
+    if mode == "instanced":
+        return [out_dir / GLYPH_LIBRARY] + [out_dir / f"{text.lower()}.json" for text in item["texts"]]
+    if mode == "bundle":
+        return [out_dir / SIGN_BUNDLE, out_dir / SIGN_INDEX]
+    return [out_dir / f"{SDF_ATLAS}.{settings['image_format']}", out_dir / f"{SDF_ATLAS}.json"]
+
+
+def _build_key(font_sha256: str, mode: str, item: dict, settings: dict) -> str:
+    inputs = {
+        "generator": GENERATOR_VERSION,
+        "font_sha256": font_sha256,
+        "mode": mode,
+        "text": item.get("text"),
+        "texts": item.get("texts"),
+        "settings": settings,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _load_build_manifest(path: Path) -> Tuple[dict, List[str]]:
+    """(entries by job id, orphaned outputs not yet pruned) from an earlier run."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return data["entries"], list(data.get("orphans", []))
+    except FileNotFoundError:
+        return {}, []
+    except (ValueError, KeyError):
+        LOGGER.warning("Ignoring unreadable build manifest %s", path.as_posix())
+        return {}, []
+
+
+def _save_build_manifest(path: Path, entries: dict, orphans: Iterable[str] = ()) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    data = {"generator": GENERATOR_VERSION, "entries": dict(sorted(entries.items()))}
+    if orphans:
+        data["orphans"] = sorted(orphans)
+    tmp.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _run_jobs(
+    fn: Callable[..., object], items: List[dict], jobs: int
+) -> Iterator[Tuple[dict, object, BaseException | None]]:
+    """Call fn(**item) for every item; yields (item, result, error) as each finishes."""
+    if jobs <= 1:
+        for item in items:
+            try:
+                yield item, fn(**item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    # Items are grouped by font, so each worker mostly reuses its font/glyph cache.
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(fn, **item): item for item in items}
+        for fut in as_completed(futures):
+            error = fut.exception()
+            yield futures[fut], None if error else fut.result(), error
+
+
 def main(argv: Iterable[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="Generate extruded 3D text GLBs for neon signs.")
     parser.add_argument(
         "--font",
         type=Path,
-        default=_existing_font_default() or Path("public/fonts/Orbitron-Bold.ttf"),
-        help="Path to a .ttf/.otf font file (recommend a bold font).",
+        nargs="+",
+        default=None,
+        help="Path(s) to .ttf/.otf font files (recommend a bold font; default: Orbitron-Bold).",
+    )
+    parser.add_argument(
+        "--fonts-dir",
+        type=Path,
+        default=None,
+        help="Also generate for every .ttf/.otf in this directory (e.g. public/fonts).",
     )
     parser.add_argument(
         "--out-dir",
@@ -239,6 +793,12 @@ def main(argv: Iterable[str] | None = None) -> int:
         default=0.12,
         help="Extrusion depth in scene units (Z axis).",
     )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Max distance (scene units) between flattened and true glyph curves (default: {DEFAULT_TOLERANCE}).",
+    )
     parser.add_argument(
         "--no-center",
         action="store_true",
@@ -250,6 +810,51 @@ def main(argv: Iterable[str] | None = None) -> int:
         default=_default_texts(),
         help="Texts to generate (space separated).",
     )
+    parser.add_argument(
+        "--instanced",
+        action="store_true",
+        help=f"Write a shared {GLYPH_LIBRARY} per font plus a glyph placement .json per text instead of one GLB per text.",
+    )
+    parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help=f"Write all texts of a font into one {SIGN_BUNDLE} (named nodes) plus a {SIGN_INDEX} of bounds.",
+    )
+    parser.add_argument(
+        "--sdf",
+        action="store_true",
+        help=f"Write an SDF glyph atlas ({SDF_ATLAS}.png/.json) per font instead of geometry.",
+    )
+    parser.add_argument("--sdf-size", type=int, default=48, help="SDF pixels per em (default: 48).")
+    parser.add_argument("--sdf-spread", type=float, default=6.0, help="SDF distance range in pixels (default: 6).")
+    parser.add_argument(
+        "--sdf-format", choices=["png", "webp"], default="png", help="SDF atlas image format (webp is lossless)."
+    )
+    parser.add_argument(
+        "--lods",
+        type=_parse_lods,
+        default=(),
+        help=(
+            "Comma-separated outline simplification tolerances (scene units) for LOD1..N, "
+            f"e.g. 0.01,0.03,0.08; writes <text>_lod<N>.glb and {LOD_MANIFEST}."
+        ),
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help=f"Rebuild everything, even outputs {BUILD_MANIFEST} records as up to date.",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Delete outputs of earlier runs that no requested text/font/LOD level produces any more.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for the font x text matrix (0 = all cores, default: 1 = serial).",
+    )
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -263,31 +868,161 @@ def main(argv: Iterable[str] | None = None) -> int:
         format="%(asctime)s %(levelname)s %(name)s: %(message)s",
     )
 
-    if not args.font.exists():
-        LOGGER.error("Font not found: %s", args.font)
+    if args.tolerance <= 0:
+        parser.error("--tolerance must be positive")
+    if sum((args.instanced, args.bundle, args.sdf)) > 1:
+        parser.error("--instanced, --bundle and --sdf are mutually exclusive")
+    if args.lods and (args.instanced or args.bundle or args.sdf):
+        parser.error("--lods only applies to per-text GLBs")
+    if args.sdf and (args.sdf_size < 8 or args.sdf_spread <= 0):
+        parser.error("--sdf-size must be >= 8 and --sdf-spread positive")
+
+    if args.fonts_dir is not None and not args.fonts_dir.is_dir():
+        LOGGER.error("Fonts directory not found: %s", args.fonts_dir)
+        return 2
+    if args.font is None:
+        default_font = _existing_font_default() or Path("public/fonts/Orbitron-Bold.ttf")
+        args.font = [default_font] if args.fonts_dir is None else []
+    fonts = _font_paths(args.font, args.fonts_dir)
+    missing = [f for f in fonts if not f.exists()]
+    if missing or not fonts:
+        LOGGER.error("Font not found: %s", ", ".join(map(str, missing)) or args.fonts_dir)
         return 2
 
-    failures = 0
-    for text in tqdm(args.texts, desc="Generating neon GLBs", unit="text"):
-        out_path = args.out_dir / f"{text.lower()}.glb"
-        try:
-            extrude_text_to_glb(
-                font_path=args.font,
+    # Several fonts go to one subdirectory per font, as in public/models/neon-signs.
+    per_font = len(fonts) > 1 or args.fonts_dir is not None
+    settings = dict(
+        text_height=float(args.height),
+        extrude_depth=float(args.depth),
+        center=not args.no_center,
+        tolerance=float(args.tolerance),
+    )
+    per_font_job = args.instanced or args.bundle or args.sdf
+    if args.sdf:
+        settings = dict(em_size=args.sdf_size, spread=args.sdf_spread, image_format=args.sdf_format)
+    if per_font_job:
+        fn = write_sdf_atlas if args.sdf else write_instanced_signs if args.instanced else write_sign_bundle
+        items = [
+            dict(font_path=font, texts=args.texts, out_dir=args.out_dir / font.stem if per_font else args.out_dir)
+            for font in fonts
+        ]
+    else:
+        fn = extrude_text_to_glb
+        items = [
+            dict(
+                font_path=font,
                 text=text,
-                out_path=out_path,
-                text_height=float(args.height),
-                extrude_depth=float(args.depth),
-                center=not args.no_center,
+                out_path=(args.out_dir / font.stem if per_font else args.out_dir) / f"{text.lower()}.glb",
             )
-        except Exception:
-            failures += 1
-            LOGGER.exception("Failed to generate %s", text)
+            for font in fonts
+            for text in args.texts
+        ]
+        settings["lod_tolerances"] = args.lods
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    unit = "font" if per_font_job else "text"
+
+    # Skip jobs whose inputs (font bytes, text, settings, generator) are unchanged
+    # since the manifest recorded them and whose outputs are all still there.
+    mode = "sdf" if args.sdf else "instanced" if args.instanced else "bundle" if args.bundle else "glb"
+    manifest_path = args.out_dir / BUILD_MANIFEST
+    manifest, orphans = _load_build_manifest(manifest_path)
+    font_hashes = {font: _file_sha256(font) for font in fonts}
+
+    def job_id(item: dict) -> str:
+        return _expected_outputs(item, mode, settings)[0].relative_to(args.out_dir).as_posix()
+
+    keys: dict[str, str] = {}
+    todo = []
+    for item in items:
+        keys[job_id(item)] = key = _build_key(font_hashes[item["font_path"]], mode, item, settings)
+        entry = manifest.get(job_id(item))
+        up_to_date = entry is not None and entry.get("key") == key
+        if up_to_date and not args.force and all(p.exists() for p in _expected_outputs(item, mode, settings)):
+            continue
+        todo.append(item)
+    skipped = len(items) - len(todo)
+
+    # Outputs the current job set no longer produces: everything recorded for
+    # jobs that are gone (removed texts/fonts, another mode) plus files a kept
+    # job stopped writing (e.g. _lodN levels after --lods shrank).
+    expected = {
+        p.relative_to(args.out_dir).as_posix() for item in items for p in _expected_outputs(item, mode, settings)
+    }
+    dropped_lods: dict[Path, List[str]] = {}
+    for job in sorted(set(manifest) - set(keys)):
+        entry = manifest.pop(job)
+        orphans.extend(entry.get("outputs", []))
+        if entry.get("mode") == "glb":
+            dropped_lods.setdefault((args.out_dir / job).parent, []).append(entry.get("text"))
+    for job in keys:
+        orphans.extend(manifest.get(job, {}).get("outputs", []))
+    orphans = sorted({rel for rel in orphans if rel not in expected and (args.out_dir / rel).exists()})
+
+    built = failures = 0
+    lod_entries: dict[Path, dict] = {}
+    t0 = time.perf_counter()
+    for item, result, error in tqdm(
+        _run_jobs(fn, [dict(item, **settings) for item in todo], jobs),
+        total=len(todo),
+        desc="Generating neon GLBs",
+        unit=unit,
+    ):
+        label = item.get("text", "glyph library" if args.instanced else "SDF atlas" if args.sdf else "sign bundle")
+        if error is not None:
+            failures += len(item["texts"]) if per_font_job else 1
+            LOGGER.error("Failed to generate %s (%s)", label, item["font_path"].name, exc_info=error)
+        elif per_font_job:
+            failures += len(result)
+        elif args.lods:
+            lod_entries.setdefault(item["out_path"].parent, {})[item["text"]] = result
+
+        if error is not None or (per_font_job and result):
+            manifest.pop(job_id(item), None)  # rebuild next run
+            continue
+        built += 1
+        manifest[job_id(item)] = {
+            "key": keys[job_id(item)],
+            "font": item["font_path"].name,
+            "mode": mode,
+            **{k: item[k] for k in ("text", "texts") if k in item},
+            "outputs": [p.relative_to(args.out_dir).as_posix() for p in _expected_outputs(item, mode, settings)],
+        }
+    elapsed = time.perf_counter() - t0
+    for out_dir in sorted(set(lod_entries) | {d for d in dropped_lods if (d / LOD_MANIFEST).exists()}):
+        path = _write_lod_manifest(out_dir, lod_entries.get(out_dir, {}), drop=dropped_lods.get(out_dir, ()))
+        LOGGER.info("Wrote %s", path.as_posix())
+    if orphans and args.prune:
+        for rel in orphans:
+            (args.out_dir / rel).unlink(missing_ok=True)
+        LOGGER.info("Removed %d orphaned output(s): %s", len(orphans), ", ".join(orphans))
+        orphans = []
+    elif orphans:
+        LOGGER.warning(
+            "%d output(s) in %s are left over from earlier runs (use --prune to delete): %s",
+            len(orphans),
+            args.out_dir.as_posix(),
+            ", ".join(orphans),
+        )
+    _save_build_manifest(manifest_path, manifest, orphans)
+
+    LOGGER.info(
+        "%d font(s) x %d text(s): built %d, skipped %d unchanged, failed %d in %.2fs (%.1f %ss/s, %d job(s))",
+        len(fonts),
+        len(args.texts),
+        built,
+        skipped,
+        failures,
+        elapsed,
+        len(todo) / max(elapsed, 1e-9),
+        unit,
+        jobs,
+    )
 
     if failures:
         LOGGER.error("Done with %d failures.", failures)
         return 1
 
-    LOGGER.info("Done. Generated %d files in %s", len(args.texts), args.out_dir.as_posix())
+    LOGGER.info("Done. Output is up to date in %s", args.out_dir.as_posix())
     return 0
 
 
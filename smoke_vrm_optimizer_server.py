@@ -0,0 +1,114 @@
+"""Localhost smoke test for vrm_optimizer_server.
+
+Starts the service on an ephemeral port (port 0) in this process, then:
+  - checks GET /healthz;
+  - POSTs a corpus GLB to /optimize and compares the response byte for byte
+    with what the vrm_optimizer CLI writes for the same file and settings;
+  - fills every admission slot and checks the next POST gets 503 with a
+    Retry-After header, and that /metrics counts it as rejected.
+
+Exits non-zero on the first mismatch.
+
+Example:
+    python smoke_vrm_optimizer_server.py
+    python smoke_vrm_optimizer_server.py public/models/some-model.glb
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import vrm_optimizer_server as server_mod
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_GLB = ROOT / "public/three-avatar/asset/avatar-example/rpm.glb"
+
+
+def _post(url: str, data: bytes) -> tuple[int, dict, bytes]:
+    req = urllib.request.Request(url, data=data, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=300) as resp:
+            return resp.status, dict(resp.headers), resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def _get(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=30) as resp:
+        return resp.read()
+
+
+def _cli_output(glb: Path, tmp: Path) -> bytes:
+    """Optimize a copy of `glb` with the CLI at the server's default settings."""
+    source = tmp / f"{glb.stem}.vrm"
+    shutil.copyfile(glb, source)
+    cmd = [sys.executable, str(ROOT / "vrm_optimizer.py"), str(source), "--suffix", "_cli"]
+    for key, value in server_mod.DEFAULT_SETTINGS.items():
+        cmd += [f"--{key.replace('_', '-')}", str(value)]
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return (tmp / f"{glb.stem}_cli.vrm").read_bytes()
+
+
+def _check(ok: bool, message: str) -> None:
+    if not ok:
+        raise SystemExit(f"FAIL: {message}")
+    print(f"ok: {message}")
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Smoke-test vrm_optimizer_server on localhost.")
+    p.add_argument(
+        "glb",
+        nargs="?",
+        type=Path,
+        default=DEFAULT_GLB,
+        help=f"GLB to post (default: {DEFAULT_GLB.relative_to(ROOT)})",
+    )
+    args = p.parse_args()
+
+    service = server_mod.OptimizerService(1, 0, 64 * 1024 * 1024, dict(server_mod.DEFAULT_SETTINGS))
+    server = server_mod.make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            _check(_get(f"{base}/healthz") == b"ok", "GET /healthz")
+
+            data = args.glb.read_bytes()
+            status, headers, body = _post(f"{base}/optimize?name={args.glb.stem}.vrm", data)
+            _check(status == 200, f"POST /optimize -> {status}")
+            stats = json.loads(headers.get("X-Optimizer-Stats", "{}"))
+            _check(stats.get("output_bytes") == len(body), f"X-Optimizer-Stats output_bytes = {len(body)}")
+            expected = _cli_output(args.glb, Path(tmp))
+            _check(body == expected, f"response matches CLI output ({len(body)} vs {len(expected)} bytes)")
+
+            # workers=1, max_queue=0: holding the single slot makes the house full.
+            _check(service.slots.acquire(blocking=False), "took the only admission slot")
+            try:
+                status, headers, _body = _post(f"{base}/optimize", data)
+            finally:
+                service.slots.release()
+            _check(status == 503, f"POST with a full queue -> {status}")
+            _check(headers.get("Retry-After") == "1", "503 carries Retry-After")
+
+            metrics = json.loads(_get(f"{base}/metrics"))
+            _check(metrics["rejected"] == 1 and metrics["ok"] == 1, "GET /metrics counts 1 ok, 1 rejected")
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.shutdown()
+    print("All server smoke checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,17 +5,34 @@ preserving VRM extensions. Designed to run locally (no Colab).
 
 Example:
     python vrm_optimizer.py public/three-avatar/avatars/adam.vrm --target-mb 5
+    python vrm_optimizer.py public/three-avatar/avatars/*.vrm --jobs 0
+    python vrm_optimizer.py public/avatar-assets/*.glb --atlas-dir build/avatar-assets
+    python vrm_optimizer.py avatar.vrm --tiers desktop=1024:75,mobile=512:60,low=256:50
+    python vrm_optimizer.py --watch public/avatar-assets --jobs 0
 """
 
 from __future__ import annotations
 
 import argparse
+import functools
+import hashlib
+import heapq
 import io
+import json
+import math
+import mmap
 import os
+import struct
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field, fields, is_dataclass
 from pathlib import Path
 
-from PIL import Image
-from pygltflib import GLTF2
+import PIL
+from PIL import Image, ImageChops, ImageStat
+from pygltflib import GLTF2, Accessor, Buffer, BufferView, Texture
+from pygltflib import Image as GltfImage
 
 def pad4(data: bytes) -> bytes:
     return data + b"\x00" * ((4 - (len(data) % 4)) % 4)
@@ -43,49 +60,836 @@ def get_normal_texture_image_indices(gltf: GLTF2):
                     image_indices.add(tex.source)
     return image_indices
 
-def rebuild_blob_with_replacements(gltf: GLTF2, original_blob: bytes, replacements: dict):
+GLB_MAGIC = b"glTF"
+GLB_VERSION = 2
+CHUNK_JSON = b"JSON"
+CHUNK_BIN = b"BIN\x00"
+
+
+class GlbSource:
+    """A GLB opened for reading: parsed JSON plus a zero-copy view of its BIN chunk.
+
+    The file is memory-mapped, so `bin` slices cost nothing until touched and
+    the model is never held in memory as a whole. Call `close()` (or use as a
+    context manager) once nothing needs `bin` any more.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise RuntimeError(f"Not a GLB file: {path}")
+        self._view = memoryview(self._map)
+
+        magic, version, length = struct.unpack_from("<4sII", self._view, 0)
+        if magic != GLB_MAGIC:
+            self.close()
+            raise RuntimeError(f"Not a GLB file: {path}")
+
+        json_text = None
+        self.bin = self._view[0:0]
+        index = 12
+        while index + 8 <= min(length, len(self._view)):
+            chunk_len, chunk_type = struct.unpack_from("<I4s", self._view, index)
+            index += 8
+            if chunk_type == CHUNK_JSON:
+                json_text = bytes(self._view[index : index + chunk_len]).decode("utf-8")
+            elif chunk_type == CHUNK_BIN and not self.bin:
+                self.bin = self._view[index : index + chunk_len]
+            index += chunk_len
+
+        if json_text is None:
+            self.close()
+            raise RuntimeError(f"GLB has no JSON chunk: {path}")
+        self.gltf = GLTF2.gltf_from_json(json_text)
+
+    def close(self) -> None:
+        self.bin.release()
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "GlbSource":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def remap_buffer_view_refs(node, mapping: dict[int, int]) -> None:
+    """Rewrite every bufferView index reachable from `node` through `mapping`.
+
+    Walks pygltflib dataclasses (accessors, sparse indices/values, images) and
+    extension dicts (e.g. KHR_draco_mesh_compression), so references from
+    extensions we don't know about by name are kept valid too. `extras` is
+    application data and left alone.
+    """
+    if is_dataclass(node):
+        for f in fields(node):
+            if f.name in ("extras", "bufferViews"):
+                continue
+            value = getattr(node, f.name)
+            if f.name == "bufferView" and isinstance(value, int):
+                setattr(node, f.name, mapping[value])
+            else:
+                remap_buffer_view_refs(value, mapping)
+    elif isinstance(node, dict):
+        for key, value in node.items():
+            if key == "extras":
+                continue
+            if key == "bufferView" and isinstance(value, int):
+                node[key] = mapping[value]
+            else:
+                remap_buffer_view_refs(value, mapping)
+    elif isinstance(node, list):
+        for item in node:
+            remap_buffer_view_refs(item, mapping)
+
+
+def drop_buffer_views(gltf: GLTF2, drop: set, redirect: dict | None = None) -> dict[int, int]:
+    """Remove bufferViews in `drop` and compact the indices of the rest.
+
+    `redirect` maps dropped views that are still referenced to the view that
+    replaces them; every other dropped view must be unreferenced. Returns the
+    old -> new index mapping of the views that remain.
+    """
+    redirect = redirect or {}
+    mapping: dict[int, int] = {}
+    kept = []
+    for i, bv in enumerate(gltf.bufferViews):
+        if i not in drop:
+            mapping[i] = len(kept)
+            kept.append(bv)
+    for old, new in redirect.items():
+        mapping[old] = mapping[new]
+
+    remap_buffer_view_refs(gltf, mapping)
+    gltf.bufferViews = kept
+    return mapping
+
+
+def dedupe_buffer_views(gltf: GLTF2, blob) -> tuple[int, int]:
+    """Merge bufferViews with identical bytes and layout into one.
+
+    Duplicate embedded images end up sharing a single bufferView (image
+    entries and their indices are kept, so VRM/VRMC references such as the
+    thumbnail stay valid), and accessors over identical geometry are pointed
+    at one copy. The orphaned duplicates are dropped; the writer then never
+    emits their bytes. Returns (views removed, bytes saved).
+    """
+    bvs = gltf.bufferViews or []
+
+    # Only views whose length collides can be duplicates; skip hashing the rest.
+    by_length: dict[tuple, list[int]] = {}
+    for i, bv in enumerate(bvs):
+        if bv.extensions:  # e.g. EXT_meshopt_compression; leave alone
+            continue
+        by_length.setdefault((bv.byteLength or 0, bv.byteStride, bv.target), []).append(i)
+
+    redirect: dict[int, int] = {}
+    saved = 0
+    for (ln, _stride, _target), group in by_length.items():
+        if len(group) < 2:
+            continue
+        first_by_digest: dict[bytes, int] = {}
+        for i in group:
+            off = bvs[i].byteOffset or 0
+            digest = hashlib.sha256(blob[off : off + ln]).digest()
+            keep = first_by_digest.setdefault(digest, i)
+            if keep != i:
+                redirect[i] = keep
+                saved += ln + (-ln % 4)
+
+    if redirect:
+        drop_buffer_views(gltf, set(redirect), redirect)
+    return len(redirect), saved
+
+
+# Extensions whose index references prune_unused knows how to follow.
+# Material extensions are covered generically (any "*Texture" textureInfo).
+PRUNE_KNOWN_EXTENSIONS = {
+    "VRM",
+    "VRMC_vrm",
+    "VRMC_springBone",
+    "VRMC_node_constraint",
+    "VRMC_materials_mtoon",
+    "VRMC_materials_hdr_emissiveMultiplier",
+    "KHR_texture_transform",
+    "KHR_mesh_quantization",
+    "KHR_draco_mesh_compression",
+    "KHR_lights_punctual",
+    "KHR_texture_basisu",
+    "EXT_texture_webp",
+    "EXT_mesh_gpu_instancing",
+}
+
+
+def _texture_infos(node, key: str = ""):
+    """Yield every textureInfo (dataclass or dict) under a material-like tree.
+
+    A textureInfo is anything stored under a key ending in "Texture" that has
+    an integer `index`, which covers core materials, KHR_materials_* and
+    VRMC_materials_mtoon alike.
+    """
+    if is_dataclass(node):
+        if key.endswith("Texture") and isinstance(getattr(node, "index", None), int):
+            yield node
+        for f in fields(node):
+            if f.name != "extras":
+                yield from _texture_infos(getattr(node, f.name), f.name)
+    elif isinstance(node, dict):
+        if key.endswith("Texture") and isinstance(node.get("index"), int):
+            yield node
+        for k, v in node.items():
+            if k != "extras":
+                yield from _texture_infos(v, k)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _texture_infos(item, key)
+
+
+def _get_index(info) -> int:
+    return info["index"] if isinstance(info, dict) else info.index
+
+
+def _set_index(info, value: int) -> None:
+    if isinstance(info, dict):
+        info["index"] = value
+    else:
+        info.index = value
+
+
+def _compact(items: list, used: set) -> tuple[list, dict[int, int]]:
+    mapping: dict[int, int] = {}
+    kept = []
+    for i, item in enumerate(items):
+        if i in used:
+            mapping[i] = len(kept)
+            kept.append(item)
+    return kept, mapping
+
+
+def prune_unused(gltf: GLTF2, replacements: dict | None = None) -> dict[str, int]:
+    """Drop meshes, accessors, bufferViews, textures, images and samplers nothing uses.
+
+    Reachability starts from nodes (meshes, skins, instancing), materials
+    (every textureInfo, including extension textures), skins, animations and
+    the VRM 0.x / VRMC_vrm blocks (blend shape and first-person mesh binds,
+    materialProperties textures, thumbnails). Nodes, materials, skins and
+    animations themselves are kept, so humanoid bones, spring bones and
+    expressions keep their indices. Surviving indices are compacted and every
+    reference is rewritten.
+
+    `replacements` (bufferView index -> bytes), if given, is re-keyed in place
+    to the compacted bufferView indices. Skipped (returns {}) when
+    extensionsUsed lists an extension we can't follow, since it might
+    reference anything.
+    Returns the number of removed entries per kind.
+    """
+    used_ext = set(gltf.extensionsUsed or [])
+    unknown = sorted(e for e in used_ext if e not in PRUNE_KNOWN_EXTENSIONS and not e.startswith("KHR_materials_"))
+    if unknown:
+        return {}
+
+    exts = gltf.extensions or {}
+    vrm0 = exts.get("VRM") or {}
+    vrm0_meta = vrm0.get("meta") or {}
+    vrmc_meta = (exts.get("VRMC_vrm") or {}).get("meta") or {}
+    vrm0_binds = [
+        bind
+        for group in (vrm0.get("blendShapeMaster") or {}).get("blendShapeGroups") or []
+        for bind in group.get("binds") or []
+    ]
+    vrm0_annotations = (vrm0.get("firstPerson") or {}).get("meshAnnotations") or []
+    vrm0_tex_props = [
+        props.get("textureProperties") or {} for props in vrm0.get("materialProperties") or []
+    ]
+
+    # --- reachability
+    used_meshes = {n.mesh for n in gltf.nodes or [] if n.mesh is not None}
+    used_meshes |= {r["mesh"] for r in vrm0_binds + vrm0_annotations if isinstance(r.get("mesh"), int)}
+
+    material_infos = list(_texture_infos(gltf.materials or []))
+    used_textures = {_get_index(info) for info in material_infos}
+    used_textures |= {t for props in vrm0_tex_props for t in props.values() if isinstance(t, int)}
+    if isinstance(vrm0_meta.get("texture"), int):
+        used_textures.add(vrm0_meta["texture"])
+
+    textures = gltf.textures or []
+    used_images: set[int] = set()
+    used_samplers: set[int] = set()
+    for t in used_textures:
+        tex = textures[t]
+        if tex.source is not None:
+            used_images.add(tex.source)
+        if tex.sampler is not None:
+            used_samplers.add(tex.sampler)
+        for ext in (tex.extensions or {}).values():
+            if isinstance(ext, dict) and isinstance(ext.get("source"), int):
+                used_images.add(ext["source"])
+    if isinstance(vrmc_meta.get("thumbnailImage"), int):
+        used_images.add(vrmc_meta["thumbnailImage"])
+
+    meshes = gltf.meshes or []
+    used_accessors: set[int] = set()
+    for m in used_meshes:
+        for prim in meshes[m].primitives or []:
+            used_accessors.update(_primitive_attributes(prim).values())
+            if prim.indices is not None:
+                used_accessors.add(prim.indices)
+            for target in prim.targets or []:
+                used_accessors.update(v for v in target.values() if isinstance(v, int))
+    for skin in gltf.skins or []:
+        if skin.inverseBindMatrices is not None:
+            used_accessors.add(skin.inverseBindMatrices)
+    for anim in gltf.animations or []:
+        for sampler in anim.samplers or []:
+            used_accessors.update(a for a in (sampler.input, sampler.output) if a is not None)
+    for node in gltf.nodes or []:
+        inst = (node.extensions or {}).get("EXT_mesh_gpu_instancing") or {}
+        used_accessors.update(v for v in (inst.get("attributes") or {}).values() if isinstance(v, int))
+
+    accessors = gltf.accessors or []
+    used_views: set[int] = set()
+    for a in used_accessors:
+        acc = accessors[a]
+        if acc.bufferView is not None:
+            used_views.add(acc.bufferView)
+        if acc.sparse is not None:
+            used_views.update((acc.sparse.indices.bufferView, acc.sparse.values.bufferView))
+    for i in used_images:
+        if gltf.images[i].bufferView is not None:
+            used_views.add(gltf.images[i].bufferView)
+    for m in used_meshes:
+        for prim in meshes[m].primitives or []:
+            draco = (prim.extensions or {}).get("KHR_draco_mesh_compression") or {}
+            if isinstance(draco.get("bufferView"), int):
+                used_views.add(draco["bufferView"])
+
+    removed = {
+        "meshes": len(meshes) - len(used_meshes),
+        "accessors": len(accessors) - len(used_accessors),
+        "bufferViews": len(gltf.bufferViews or []) - len(used_views),
+        "textures": len(textures) - len(used_textures),
+        "images": len(gltf.images or []) - len(used_images),
+        "samplers": len(gltf.samplers or []) - len(used_samplers),
+    }
+    if not any(removed.values()):
+        return {}
+
+    # --- compaction (bufferViews last: images/accessors must be remapped first)
+    gltf.meshes, mesh_map = _compact(meshes, used_meshes)
+    for node in gltf.nodes or []:
+        if node.mesh is not None:
+            node.mesh = mesh_map[node.mesh]
+    for ref in vrm0_binds + vrm0_annotations:
+        if isinstance(ref.get("mesh"), int):
+            ref["mesh"] = mesh_map[ref["mesh"]]
+
+    gltf.accessors, acc_map = _compact(accessors, used_accessors)
+    for mesh in gltf.meshes:
+        for prim in mesh.primitives or []:
+            attrs = prim.attributes if isinstance(prim.attributes, dict) else vars(prim.attributes)
+            for semantic, a in _primitive_attributes(prim).items():
+                attrs[semantic] = acc_map[a]
+            if prim.indices is not None:
+                prim.indices = acc_map[prim.indices]
+            for target in prim.targets or []:
+                for k, v in target.items():
+                    if isinstance(v, int):
+                        target[k] = acc_map[v]
+    for skin in gltf.skins or []:
+        if skin.inverseBindMatrices is not None:
+            skin.inverseBindMatrices = acc_map[skin.inverseBindMatrices]
+    for anim in gltf.animations or []:
+        for sampler in anim.samplers or []:
+            sampler.input = acc_map.get(sampler.input, sampler.input)
+            sampler.output = acc_map.get(sampler.output, sampler.output)
+    for node in gltf.nodes or []:
+        attrs = ((node.extensions or {}).get("EXT_mesh_gpu_instancing") or {}).get("attributes") or {}
+        for k, v in attrs.items():
+            if isinstance(v, int):
+                attrs[k] = acc_map[v]
+
+    gltf.textures, tex_map = _compact(textures, used_textures)
+    for info in material_infos:
+        _set_index(info, tex_map[_get_index(info)])
+    for props in vrm0_tex_props:
+        for k, v in props.items():
+            if isinstance(v, int):
+                props[k] = tex_map[v]
+    if isinstance(vrm0_meta.get("texture"), int):
+        vrm0_meta["texture"] = tex_map[vrm0_meta["texture"]]
+
+    gltf.images, img_map = _compact(gltf.images or [], used_images)
+    gltf.samplers, sampler_map = _compact(gltf.samplers or [], used_samplers)
+    for tex in gltf.textures:
+        if tex.source is not None:
+            tex.source = img_map[tex.source]
+        if tex.sampler is not None:
+            tex.sampler = sampler_map[tex.sampler]
+        for ext in (tex.extensions or {}).values():
+            if isinstance(ext, dict) and isinstance(ext.get("source"), int):
+                ext["source"] = img_map[ext["source"]]
+    if isinstance(vrmc_meta.get("thumbnailImage"), int):
+        vrmc_meta["thumbnailImage"] = img_map[vrmc_meta["thumbnailImage"]]
+
+    view_map = drop_buffer_views(gltf, set(range(len(gltf.bufferViews or []))) - used_views)
+    if replacements:
+        kept = {view_map[i]: data for i, data in replacements.items() if i in view_map}
+        replacements.clear()
+        replacements.update(kept)
+    return {kind: n for kind, n in removed.items() if n}
+
+
+def _print_pruned(removed: dict[str, int]) -> None:
+    if removed:
+        print("Pruned unused " + ", ".join(f"{n} {kind}" for kind, n in removed.items()) + ".")
+
+
+def _glb_json_chunk(gltf: GLTF2, lengths: list[int]) -> tuple[bytes, int]:
+    """JSON chunk (padded) and BIN length for bufferViews of `lengths`.
+
+    Packs bufferViews in index order, each padded to the chunk alignment, into
+    a single buffer, the same layout pygltflib's `save_binary` produces.
+    `gltf` is left untouched.
+    """
+    align = gltf.required_alignment()
     bvs = gltf.bufferViews
     if not bvs:
         raise RuntimeError("No bufferViews found.")
+    if not gltf.buffers:
+        raise RuntimeError("No buffers found.")
+    if any(getattr(b, "uri", None) for b in gltf.buffers):
+        raise RuntimeError("Only GLB-embedded buffers are supported.")
 
-    order = sorted(range(len(bvs)), key=lambda i: (bvs[i].byteOffset or 0))
+    saved_views = [(bv.buffer, bv.byteOffset, bv.byteLength) for bv in bvs]
+    saved_buffers = gltf.buffers
 
-    new_blob = bytearray()
-    cursor = 0
+    bin_len = 0
+    try:
+        for bv, ln in zip(bvs, lengths):
+            bv.buffer = 0
+            bv.byteOffset = bin_len
+            bv.byteLength = ln  # logical length (unpadded)
+            bin_len += ln + (-ln % align)
+        gltf.buffers = [Buffer(byteLength=bin_len)]
+        json_blob = gltf.gltf_to_json(separators=(",", ":"), indent=None).encode("utf-8")
+    finally:
+        for bv, (buf, off, ln) in zip(bvs, saved_views):
+            bv.buffer, bv.byteOffset, bv.byteLength = buf, off, ln
+        gltf.buffers = saved_buffers
+
+    json_blob += b" " * (-(12 + len(json_blob)) % align)
+    return json_blob, bin_len
+
+
+def _view_lengths(gltf: GLTF2, replacements: dict) -> list[int]:
+    return [
+        len(replacements[i]) if i in replacements else (bv.byteLength or 0)
+        for i, bv in enumerate(gltf.bufferViews or [])
+    ]
 
-    for i in order:
-        bv = bvs[i]
-        off = bv.byteOffset or 0
-        ln = bv.byteLength or 0
 
-        if off > cursor:
-            new_blob += original_blob[cursor:off]
-            cursor = off
+def write_glb(gltf: GLTF2, blob, replacements: dict, f) -> int:
+    """Stream a GLB with `replacements` (bufferView index -> bytes) spliced in.
 
+    Unchanged bufferViews are written straight from `blob` (typically a
+    `GlbSource.bin` memoryview) without copying, so memory stays bounded by
+    the replacement payloads. Returns the number of bytes written.
+    """
+    align = gltf.required_alignment()
+    lengths = _view_lengths(gltf, replacements)
+    json_blob, bin_len = _glb_json_chunk(gltf, lengths)
+    total = 12 + 8 + len(json_blob) + 8 + bin_len
+
+    f.write(struct.pack("<4sII", GLB_MAGIC, GLB_VERSION, total))
+    f.write(struct.pack("<I4s", len(json_blob), CHUNK_JSON))
+    f.write(json_blob)
+    f.write(struct.pack("<I4s", bin_len, CHUNK_BIN))
+    for i, (bv, ln) in enumerate(zip(gltf.bufferViews, lengths)):
         if i in replacements:
-            data = replacements[i]
-            data_padded = pad4(data)
-            bv.byteOffset = len(new_blob)
-            bv.byteLength = len(data)  # logical length (unpadded)
-            new_blob += data_padded
+            f.write(replacements[i])
         else:
-            chunk = original_blob[off:off+ln]
-            bv.byteOffset = len(new_blob)
-            bv.byteLength = ln
-            new_blob += pad4(chunk)
+            off = bv.byteOffset or 0
+            f.write(blob[off : off + ln])
+        f.write(b"\x00" * (-ln % align))
+    return total
 
-        cursor = off + ln
 
-    if cursor < len(original_blob):
-        new_blob += original_blob[cursor:]
+# Reduced-size decode and integer reduce() keep at least this many times the
+# final size for the last LANCZOS pass (Pillow's own thumbnail() default).
+REDUCING_GAP = 2.0
 
-    if not gltf.buffers:
-        raise RuntimeError("No buffers found.")
-    gltf.buffers[0].byteLength = len(new_blob)
 
-    return bytes(new_blob)
+def decode_image(raw: bytes, limit: int | None = None) -> Image.Image:
+    """Decode an embedded image.
 
-def optimize_vrm_file(
+    With `limit`, JPEGs are decoded at a reduced DCT scale (draft mode) that
+    still leaves `REDUCING_GAP` times the final size, instead of at full
+    resolution; other formats decode normally.
+    """
+    im = Image.open(io.BytesIO(raw))
+    if limit is not None and im.format == "JPEG":
+        scale = limit * REDUCING_GAP / max(im.size)
+        if scale < 1.0:
+            im.draft(im.mode, (math.ceil(im.width * scale), math.ceil(im.height * scale)))
+    im.load()
+    return im
+
+
+def resize_to_limit(im: Image.Image, limit: int) -> Image.Image:
+    """Downscale so the longest side is at most `limit`, in an RGB/RGBA mode.
+
+    Fully opaque images come back as RGB.
+    """
+    # Resize (keep aspect)
+    w, h = im.size
+    scale = min(1.0, limit / max(w, h))
+    if scale < 1.0:
+        nw = max(1, int(round(w * scale)))
+        nh = max(1, int(round(h * scale)))
+        # reduce() by an integer factor first, then LANCZOS the rest of the way
+        im = im.resize((nw, nh), Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+    if im.mode not in ("RGB", "RGBA"):
+        im = im.convert("RGBA")
+    if im.mode == "RGBA" and im.getchannel("A").getextrema() == (255, 255):
+        im = im.convert("RGB")  # fully opaque: drop the alpha plane
+    return im
+
+
+def encode_image(im: Image.Image, limit: int, quality: int) -> bytes:
+    """Downscale a decoded image to `limit` (keeping aspect) and encode WebP."""
+    im = resize_to_limit(im, limit)
+
+    # Encode WebP
+    out = io.BytesIO()
+    im.save(out, format="WEBP", quality=quality, method=6)
+    return out.getvalue()
+
+
+def encode_texture(raw: bytes, limit: int, quality: int) -> bytes:
+    """Decode one embedded image, downscale it to `limit` and encode WebP.
+
+    Pure function of its arguments so it can run in a worker process; the
+    serial and `--jobs` paths both go through here, which keeps their output
+    byte-identical.
+    """
+    return encode_image(decode_image(raw, limit), limit, quality)
+
+
+def encode_texture_timed(raw: bytes, limit: int, quality: int) -> tuple[bytes, dict[str, float]]:
+    """`encode_texture` (same bytes) plus decode/resize/encode milliseconds."""
+    t0 = time.perf_counter()
+    im = decode_image(raw, limit)
+    t1 = time.perf_counter()
+    im = resize_to_limit(im, limit)
+    t2 = time.perf_counter()
+    data = encode_image(im, limit, quality)  # already within limit: no second resize
+    t3 = time.perf_counter()
+    return data, {
+        "decode_ms": (t1 - t0) * 1000,
+        "resize_ms": (t2 - t1) * 1000,
+        "encode_ms": (t3 - t2) * 1000,
+    }
+
+
+# --- Perceptual quality search -----------------------------------------------
+
+SSIM_RADIUS = 3  # 7x7 window
+SSIM_QUALITY_RANGE = (10, 95)
+
+
+def _box_mean(a, radius: int):
+    """Mean over every full (2r+1)^2 window of an (h, w, c) array, via an integral image."""
+    import numpy as np
+
+    k = 2 * radius + 1
+    c = np.pad(a.cumsum(0).cumsum(1), ((1, 0), (1, 0), (0, 0)))
+    return (c[k:, k:] - c[:-k, k:] - c[k:, :-k] + c[:-k, :-k]) / (k * k)
+
+
+def ssim(reference: Image.Image, candidate: Image.Image) -> float:
+    """Mean SSIM of the luma (Y of YCbCr) of two same-sized images.
+
+    Luma only: WebP subsamples chroma 4:2:0, so a chroma channel caps the
+    score however high the quality goes. Uses a uniform 7x7 window (shrunk
+    for tiny images) with the usual C1/C2 constants, computed with NumPy.
+    """
+    import numpy as np
+
+    x = np.asarray(reference.convert("L"), dtype=np.float64)[..., None]
+    y = np.asarray(candidate.convert("L"), dtype=np.float64)[..., None]
+    radius = min(SSIM_RADIUS, (min(x.shape[:2]) - 1) // 2)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    mx, my = _box_mean(x, radius), _box_mean(y, radius)
+    vx = _box_mean(x * x, radius) - mx * mx
+    vy = _box_mean(y * y, radius) - my * my
+    cov = _box_mean(x * y, radius) - mx * my
+    s = ((2 * mx * my + c1) * (2 * cov + c2)) / ((mx * mx + my * my + c1) * (vx + vy + c2))
+    return float(s.mean())
+
+
+def encode_texture_ssim(raw: bytes, limit: int, quality: int, target: float) -> tuple[bytes, dict]:
+    """Encode at the lowest WebP quality whose SSIM against the resized source meets `target`.
+
+    Bisects quality over `SSIM_QUALITY_RANGE`, probing the class default
+    `quality` first (assumes SSIM grows with quality). If even the top of
+    the range misses the target, the class default encode is used rather
+    than a larger one. Returns the bytes and the chosen quality/SSIM/probe
+    count.
+    """
+    t0 = time.perf_counter()
+    reference = resize_to_limit(decode_image(raw, limit), limit)
+    lo, hi = SSIM_QUALITY_RANGE
+    probes: dict[int, tuple[bytes, float]] = {}
+
+    def probe(q: int) -> bool:
+        data = encode_image(reference, limit, q)
+        probes[q] = (data, ssim(reference, decode_image(data)))
+        return probes[q][1] >= target
+
+    mid = min(max(quality, lo), hi)
+    while lo < hi:
+        if probe(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+        mid = (lo + hi) // 2
+    if lo not in probes:
+        probe(lo)
+    if probes[lo][1] < target:  # unreachable: keep the class default
+        lo = min(max(quality, SSIM_QUALITY_RANGE[0]), SSIM_QUALITY_RANGE[1])
+    data, score = probes[lo]
+    return data, {
+        "quality": lo,
+        "ssim": round(score, 5),
+        "probes": len(probes),
+        "encode_ms": (time.perf_counter() - t0) * 1000,
+    }
+
+
+# Part of every cache key: encoder settings plus the Pillow build, since a
+# different libwebp can produce different bytes for the same input.
+ENCODE_MODE = f"webp-m6/reduce{REDUCING_GAP}/pillow-{PIL.__version__}"
+
+
+class EncodeCache:
+    """On-disk, content-addressed store of encoded textures with an LRU size cap.
+
+    Entries are keyed by a hash of the raw image bytes plus (limit, quality,
+    mode), so repeat runs and textures shared between files skip the
+    decode/resize/encode path. Recency is the file mtime, refreshed on every
+    hit; the oldest entries are evicted once the cap is exceeded.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Encodes queued in this run, so duplicates share one job.
+        self._inflight: dict[str, Future] = {}
+        root.mkdir(parents=True, exist_ok=True)
+        self._size = sum(p.stat().st_size for p in root.glob("*/*.webp"))
+
+    @staticmethod
+    def key(raw_digest: str, limit: int, quality: int, mode: str = ENCODE_MODE) -> str:
+        return hashlib.sha256(f"{raw_digest}:{limit}:{quality}:{mode}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.webp"
+
+    def lookup(self, key: str) -> Future | None:
+        """Resolved/in-flight future for `key`, or None on a miss."""
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.hits += 1
+            return fut
+
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used
+        self.hits += 1
+        fut = Future()
+        fut.set_result(data)
+        return fut
+
+    def track(self, key: str, fut: Future) -> None:
+        self._inflight[key] = fut
+
+    def put(self, key: str, data: bytes) -> None:
+        self._inflight.pop(key, None)
+        path = self._path(key)
+        if path.exists():
+            return
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        self._size += len(data)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        # Trim to 90% of the cap so we don't rescan on every following put.
+        goal = int(self.max_bytes * 0.9)
+        entries = []
+        for p in self.root.glob("*/*.webp"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort(key=lambda e: e[0])
+        for _mtime, size, p in entries:
+            if self._size <= goal:
+                break
+            p.unlink(missing_ok=True)
+            self._size -= size
+            self.evictions += 1
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"Encode cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), "
+            f"{self.evictions} evictions, {self._size / (1024 * 1024):.1f}/{self.max_bytes / (1024 * 1024):.1f}MB"
+        )
+
+
+def _submit_encode(
+    executor: Executor | None,
+    cache: EncodeCache | None,
+    raw_digest: str,
+    fn,
+    src,
+    limit: int,
+    quality: int,
+) -> tuple[Future, str | None]:
+    """Queue an encode of `src` unless the cache already has it.
+
+    Returns the future plus the cache key to `put` the result under once it
+    resolves (None when there is no cache or the result came from it).
+    """
+    if cache is None:
+        return _submit(executor, fn, src, limit, quality), None
+    key = EncodeCache.key(raw_digest, limit, quality)
+    fut = cache.lookup(key)
+    if fut is not None:
+        return fut, None
+    fut = _submit(executor, fn, src, limit, quality)
+    cache.track(key, fut)
+    return fut, key
+
+
+def texture_kind(img, img_index: int, normal_image_indices: set) -> str:
+    """Classify an image as "thumb", "normal" or "general" (albedo etc.)."""
+    name = (getattr(img, "name", "") or "").lower()
+    if "thumbnail" in name:
+        return "thumb"
+    if img_index in normal_image_indices:
+        return "normal"
+    return "general"
+
+
+def settings_for_kind(kind: str, cfg: dict) -> tuple[int, int]:
+    """Return (limit, quality) for a texture kind from a settings dict."""
+    if kind == "thumb":
+        return cfg["thumb_max"], cfg["thumb_quality"]
+    if kind == "normal":
+        return cfg["normal_max"], cfg["normal_quality"]
+    return cfg["max_size"], cfg["webp_quality"]
+
+
+# When several images share one bufferView (see dedupe_buffer_views), the
+# payload is encoded once with the settings of the most demanding kind.
+KIND_PRIORITY = ("normal", "general", "thumb")
+
+
+def images_by_view(gltf: GLTF2) -> dict[int, tuple[list[int], str]]:
+    """Map bv_index -> (image indices stored in that view, kind to encode it as)."""
+    normal_image_indices = get_normal_texture_image_indices(gltf)
+    views: dict[int, tuple[list[int], str]] = {}
+    for img_index, img in enumerate(gltf.images or []):
+        bv_index = getattr(img, "bufferView", None)
+        if bv_index is None:
+            continue
+        kind = texture_kind(img, img_index, normal_image_indices)
+        if bv_index in views:
+            indices, prev = views[bv_index]
+            indices.append(img_index)
+            kind = min(prev, kind, key=KIND_PRIORITY.index)
+        else:
+            indices = [img_index]
+        views[bv_index] = (indices, kind)
+    return views
+
+
+def _submit(executor: Executor | None, fn, *args) -> Future:
+    """Run `fn` on `executor`, or inline (already-resolved future) when serial."""
+    if executor is not None:
+        return executor.submit(fn, *args)
+    fut: Future = Future()
+    try:
+        fut.set_result(fn(*args))
+    except Exception as e:
+        fut.set_exception(e)
+    return fut
+
+
+class _Stopwatch:
+    """Wall time per named stage, each lap measured from the previous one."""
+
+    def __init__(self):
+        self.stages: dict[str, float] = {}
+        self.start()
+
+    def start(self) -> None:
+        self._t = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._t) * 1000
+        self._t = now
+
+
+@dataclass
+class _PendingFile:
+    input_path: Path
+    output_path: Path
+    input_bytes: int
+    source: GlbSource
+    # (image indices, bv_index, future of encoded bytes, cache key to store under)
+    jobs: list[tuple[list[int], int, Future, str | None]]
+    cache: EncodeCache | None = None
+    # (views removed, bytes saved) by dedupe_buffer_views
+    deduped: tuple[int, int] = (0, 0)
+    # removed entries per kind by prune_unused
+    pruned: dict[str, int] = field(default_factory=dict)
+    # bufferView replacements and bytes saved per attribute by quantize_geometry
+    geometry: dict[int, bytes] = field(default_factory=dict)
+    quantized: dict[str, int] = field(default_factory=dict)
+    timer: _Stopwatch = field(default_factory=_Stopwatch)
+    # Per-job texture details for the report; None unless profiling.
+    textures: list[dict] | None = None
+
+
+class NoImagesError(SystemExit):
+    """A model without embedded images: nothing to re-encode (the CLI exits with this)."""
+
+
+def _submit_vrm_file(
     input_path: Path,
     output_path: Path,
     *,
@@ -95,81 +899,615 @@ def optimize_vrm_file(
     thumb_quality: int,
     normal_max: int,
     normal_quality: int,
-) -> None:
-    gltf = GLTF2().load_binary(str(input_path))
-    blob = gltf.binary_blob()
+    executor: Executor | None = None,
+    cache: EncodeCache | None = None,
+    dedupe: bool = True,
+    quantize: bool = False,
+    prune: bool = True,
+    source: GlbSource | None = None,
+    replacements: dict[int, bytes] | None = None,
+    profile: bool = False,
+    target_ssim: float | None = None,
+) -> _PendingFile:
+    """Start re-encoding one file's textures; `_finish_vrm_file` writes it.
 
-    print(f"\n== {input_path.name} ==")
-    print("VRM detected (before):", is_vrm(gltf))
-    if not is_vrm(gltf):
-        print("Warning: file does not look like VRM (continuing anyway).")
+    `source` may be a `GlbSource` already edited in memory (e.g. by the atlas
+    pass), with `replacements` holding the bufferView bytes that edit added.
+    `profile` collects per-texture timings and details for the report.
+    `target_ssim` picks each texture's quality by SSIM (`encode_texture_ssim`).
+    """
+    timer = _Stopwatch()
+    input_bytes = os.path.getsize(input_path)
+    source = source or GlbSource(input_path)
+    timer.lap("load")
+    gltf = source.gltf
+    blob = source.bin
 
-    normal_image_indices = get_normal_texture_image_indices(gltf)
-    replacements: dict[int, bytes] = {}
+    if not gltf.images and not quantize:
+        source.close()
+        raise NoImagesError(f"No images found in the model: {input_path.name}")
 
-    if not gltf.images:
-        raise SystemExit("No images found in the model.")
-
-    for img_index, img in enumerate(gltf.images):
-        bv_index = getattr(img, "bufferView", None)
-        if bv_index is None:
-            continue
+    cfg = {
+        "max_size": max_size,
+        "webp_quality": webp_quality,
+        "thumb_max": thumb_max,
+        "thumb_quality": thumb_quality,
+        "normal_max": normal_max,
+        "normal_quality": normal_quality,
+    }
+    pruned = prune_unused(gltf) if prune else {}
+    timer.lap("prune")
+    deduped = dedupe_buffer_views(gltf, blob) if dedupe else (0, 0)
+    timer.lap("dedupe")
+    geometry, quantized = quantize_geometry(gltf, blob) if quantize else ({}, {})
+    geometry.update(replacements or {})
+    timer.lap("quantize")
+    jobs: list[tuple[list[int], int, Future, str | None]] = []
+    textures: list[dict] | None = [] if profile else None
+    encode = encode_texture_timed if profile else encode_texture
+    if target_ssim is not None:
+        encode = functools.partial(encode_texture_ssim, target=target_ssim)
 
+    for bv_index, (img_indices, kind) in images_by_view(gltf).items():
         bv = gltf.bufferViews[bv_index]
         off = bv.byteOffset or 0
         ln = bv.byteLength or 0
-        raw = blob[off : off + ln]
+        raw = bytes(blob[off : off + ln])  # picklable for worker processes
 
+        limit, quality = settings_for_kind(kind, cfg)
+        digest = hashlib.sha256(raw).hexdigest() if cache is not None else ""
+        if target_ssim is not None:
+            digest += f":ssim={target_ssim}"
+        fut, key = _submit_encode(executor, cache, digest, encode, raw, limit, quality)
+        jobs.append((img_indices, bv_index, fut, key))
+        if profile:
+            textures.append(_texture_details(raw, img_indices, kind, limit, quality))
+    timer.lap("submit")
+
+    return _PendingFile(
+        input_path,
+        output_path,
+        input_bytes,
+        source,
+        jobs,
+        cache,
+        deduped,
+        pruned,
+        geometry,
+        quantized,
+        timer,
+        textures,
+    )
+
+
+def _texture_details(raw: bytes, img_indices: list[int], kind: str, limit: int, quality: int) -> dict:
+    """Source format/dimensions (header only, no decode) and chosen settings."""
+    details = {"images": img_indices, "kind": kind, "input_bytes": len(raw), "limit": limit, "quality": quality}
+    try:
+        with Image.open(io.BytesIO(raw)) as im:
+            details.update(format=im.format, mode=im.mode, width=im.width, height=im.height)
+    except Exception:
+        details["format"] = None
+    return details
+
+
+def _print_dedupe(deduped: tuple[int, int]) -> None:
+    removed, saved = deduped
+    if removed:
+        print(f"Deduplicated {removed} bufferViews ({saved / 1024:.1f}KB).")
+
+
+def _finish_vrm_file(pending: _PendingFile) -> dict:
+    gltf = pending.source.gltf
+    input_path = pending.input_path
+    output_path = pending.output_path
+
+    print(f"\n== {input_path.name} ==")
+    print("VRM detected (before):", is_vrm(gltf))
+    if not is_vrm(gltf) and input_path.suffix.lower() == ".vrm":
+        print("Warning: file does not look like VRM (continuing anyway).")
+    _print_pruned(pending.pruned)
+    _print_dedupe(pending.deduped)
+    _print_quantized(pending.quantized)
+
+    timer = pending.timer
+    timer.start()
+    replacements: dict[int, bytes] = dict(pending.geometry)
+    for i, (img_indices, bv_index, fut, key) in enumerate(pending.jobs):
+        details = pending.textures[i] if pending.textures is not None else {}
         try:
-            im = Image.open(io.BytesIO(raw))
-            im.load()
+            result = fut.result()
         except Exception as e:
-            print(f"Skipping image[{img_index}] (can't decode): {e}")
+            print(f"Skipping image[{img_indices[0]}] (can't decode): {e}")
+            details["error"] = str(e)
             continue
+        # Profiled encodes return (bytes, timings); cache hits are bare bytes.
+        new_bytes, timings = result if isinstance(result, tuple) else (result, {"cached": True})
+        if key is not None:
+            pending.cache.put(key, new_bytes)
+        replacements[bv_index] = new_bytes
+        details.update(timings, output_bytes=len(new_bytes))
+        if "ssim" in timings:
+            print(
+                f"  image[{img_indices[0]}]: q={timings['quality']}, SSIM {timings['ssim']:.4f}"
+                f" ({timings['probes']} probes) -> {len(new_bytes) / 1024:.1f}KB"
+            )
+        for img_index in img_indices:
+            gltf.images[img_index].mimeType = "image/webp"
+    timer.lap("wait")
 
-        name = (getattr(img, "name", "") or "").lower()
-        is_thumb = "thumbnail" in name
-        is_normal = img_index in normal_image_indices
+    encoded = len(replacements) - len(pending.geometry)
+    print(f"Re-encoded {encoded} embedded textures.")
+    report = None
+    if pending.textures is not None:
+        report = _file_report(pending, replacements)
+    write_vrm(pending.source, replacements, output_path, timer=timer)
+    output_bytes = os.path.getsize(output_path)
+    print("Old size MB:", pending.input_bytes / (1024 * 1024))
+    print("New size MB:", output_bytes / (1024 * 1024))
 
-        if is_thumb:
-            limit = thumb_max
-            quality = thumb_quality
-        elif is_normal:
-            limit = normal_max
-            quality = normal_quality
-        else:
-            limit = max_size
-            quality = webp_quality
+    stats = {
+        "input_bytes": pending.input_bytes,
+        "output_bytes": output_bytes,
+        "textures": encoded,
+    }
+    if report is not None:
+        report["output_bytes"] = output_bytes
+        report["stages_ms"] = {k: round(v, 3) for k, v in timer.stages.items()}
+        stats["report"] = report
+    return stats
 
-        # Resize (keep aspect)
-        w, h = im.size
-        scale = min(1.0, limit / max(w, h))
-        if scale < 1.0:
-            nw = max(1, int(round(w * scale)))
-            nh = max(1, int(round(h * scale)))
-            im = im.resize((nw, nh), Image.LANCZOS)
 
-        # Encode WebP
-        out = io.BytesIO()
-        if im.mode not in ("RGB", "RGBA"):
-            im = im.convert("RGBA")
-        im.save(out, format="WEBP", quality=quality, method=6)
-        new_bytes = out.getvalue()
+def _file_report(pending: _PendingFile, replacements: dict) -> dict:
+    """Per-stage timings and byte accounting for one file (see --report).
 
-        replacements[bv_index] = new_bytes
-        img.mimeType = "image/webp"
+    `stages_ms` is wall time in this process (without --jobs the encodes run
+    inline, inside "submit"); the per-texture decode, resize and encode times
+    are summed from the workers into `texture_ms`.
+    """
+    gltf = pending.source.gltf
+    json_blob, bin_len = _glb_json_chunk(gltf, _view_lengths(gltf, replacements))
+    texture_bytes = sum(t.get("output_bytes", 0) for t in pending.textures)
+    geometry_bytes = sum(len(v) for v in pending.geometry.values())
+    texture_ms = {
+        stage: round(sum(t.get(f"{stage}_ms", 0.0) for t in pending.textures), 3)
+        for stage in ("decode", "resize", "encode")
+    }
+    for t in pending.textures:
+        for k in ("decode_ms", "resize_ms", "encode_ms"):
+            if k in t:
+                t[k] = round(t[k], 3)
+    return {
+        "file": pending.input_path.name,
+        "output": pending.output_path.name,
+        "input_bytes": pending.input_bytes,
+        "bytes": {
+            "header": 12 + 8 + 8,
+            "json": len(json_blob),
+            "textures": texture_bytes,
+            "geometry": geometry_bytes,
+            # untouched bufferViews plus alignment padding
+            "other_bin": bin_len - texture_bytes - geometry_bytes,
+        },
+        "texture_ms": texture_ms,
+        "textures": pending.textures,
+    }
 
-    print(f"Re-encoded {len(replacements)} embedded textures.")
-    new_blob = rebuild_blob_with_replacements(gltf, blob, replacements)
-    gltf.set_binary_blob(new_blob)
 
+def write_vrm(
+    source: GlbSource,
+    replacements: dict,
+    output_path: Path,
+    close: bool = True,
+    timer: _Stopwatch | None = None,
+) -> None:
+    """Stream `source` with `replacements` spliced in, and verify the VRM reloads.
+
+    Writes to a temp file next to `output_path` and moves it into place, so
+    the output may be the input itself (--inplace). Closes `source` unless
+    `close` is False, for writing several outputs from one source (which
+    then must not be the input). `timer` records "write" and "verify" laps.
+    """
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    gltf.save_binary(str(output_path))
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            write_glb(source.gltf, source.bin, replacements, f)
+        if close:
+            source.close()  # release the map before replacing the input
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    if timer is not None:
+        timer.lap("write")
+
+    with GlbSource(output_path) as written:
+        print("VRM detected (after):", is_vrm(written.gltf))
+    if timer is not None:
+        timer.lap("verify")
+
+
+def estimate_glb_size(gltf: GLTF2, replacements: dict) -> int:
+    """Exact size `write_glb` would write after splicing in `replacements`.
+
+    Only the JSON chunk is serialized; no blob is built. `gltf` is left untouched.
+    """
+    json_blob, bin_len = _glb_json_chunk(gltf, _view_lengths(gltf, replacements))
+    return 12 + 8 + len(json_blob) + 8 + bin_len
+
+
+# --- Geometry quantization (KHR_mesh_quantization) --------------------------
+
+FLOAT = 5126
+BYTE = 5120
+SHORT = 5122
+UNSIGNED_SHORT = 5123
+COMPONENT_SIZES = {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}
+TYPE_COMPONENTS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+KHR_MESH_QUANTIZATION = "KHR_mesh_quantization"
+
+
+def _attribute_family(semantic: str) -> str:
+    return semantic.split("_", 1)[0] if semantic.startswith(("TEXCOORD_", "WEIGHTS_")) else semantic
+
+
+def _primitive_attributes(prim) -> dict[str, int]:
+    attrs = prim.attributes
+    items = attrs.items() if isinstance(attrs, dict) else vars(attrs).items()
+    return {k: v for k, v in items if isinstance(v, int)}
+
+
+def _read_float_accessor(gltf: GLTF2, blob, acc):
+    import numpy as np
+
+    bv = gltf.bufferViews[acc.bufferView]
+    n = TYPE_COMPONENTS[acc.type]
+    stride = bv.byteStride or 4 * n
+    start = (bv.byteOffset or 0) + (acc.byteOffset or 0)
+    data = np.ndarray((acc.count, n), dtype="<f4", buffer=blob, offset=start, strides=(stride, 4))
+    return data.astype(np.float64)
+
+
+def _as_columns(rows):
+    """View (count, k) rows as bytes, zero-padded to a 4-byte aligned width."""
+    import numpy as np
+
+    b = np.ascontiguousarray(rows).view(np.uint8).reshape(len(rows), -1)
+    pad = -b.shape[1] % 4
+    if pad:
+        b = np.concatenate([b, np.zeros((len(b), pad), dtype=np.uint8)], axis=1)
+    return b
+
+
+def _quantize_snorm(v, bits: int):
+    import numpy as np
+
+    m = (1 << (bits - 1)) - 1
+    return np.clip(np.rint(v * m), -m, m)
+
+
+def _quantize_weights(w):
+    """uint16-normalized weights whose rows still sum to exactly 1 when they did before."""
+    import numpy as np
+
+    q = np.clip(np.rint(w * 65535), 0, 65535)
+    sums = w.sum(axis=1)
+    fix = np.abs(sums - 1.0) < 1e-3
+    rows = np.nonzero(fix)[0]
+    biggest = q[rows].argmax(axis=1)
+    q[rows, biggest] += 65535 - q[rows].sum(axis=1)
+    return np.clip(q, 0, 65535)
+
+
+def _position_meshes(gltf: GLTF2) -> set[int]:
+    """Meshes whose POSITION can carry a dequantization transform on their nodes.
+
+    The mesh must have no morph targets, and every node using it must be a
+    plain, unanimated leaf: not skinned, not a joint, no children. Skinned
+    (e.g. VRM body) meshes keep float positions.
+    """
+    joints = {j for skin in gltf.skins or [] for j in (skin.joints or [])}
+    animated = {
+        ch.target.node
+        for anim in gltf.animations or []
+        for ch in anim.channels or []
+        if ch.target is not None and ch.target.node is not None
+    }
+    eligible = {
+        m for m, mesh in enumerate(gltf.meshes or [])
+        if not any(prim.targets for prim in mesh.primitives or [])
+    }
+    users: dict[int, int] = {}
+    for n, node in enumerate(gltf.nodes or []):
+        if node.mesh is None:
+            continue
+        users[node.mesh] = users.get(node.mesh, 0) + 1
+        if node.skin is not None or node.children or n in joints or n in animated:
+            eligible.discard(node.mesh)
+    return {m for m in eligible if users.get(m)}
+
+
+def _apply_dequantization(node, center, half: float) -> None:
+    """Compose the node transform with translate(center) * scale(half)."""
+    import numpy as np
+
+    if node.matrix and any(abs(a - b) > 1e-12 for a, b in zip(node.matrix, np.eye(4).ravel())):
+        m = np.array(node.matrix, dtype=np.float64).reshape(4, 4).T  # column-major
+        d = np.diag([half, half, half, 1.0])
+        d[:3, 3] = center
+        node.matrix = (m @ d).T.ravel().tolist()
+        return
+
+    t = np.array(node.translation or [0.0, 0.0, 0.0])
+    x, y, z, w = node.rotation or [0.0, 0.0, 0.0, 1.0]
+    sc = np.array(node.scale or [1.0, 1.0, 1.0])
+    v = sc * center
+    u = np.array([x, y, z])
+    v = v + 2.0 * np.cross(u, np.cross(u, v) + w * v)
+    node.translation = (t + v).tolist()
+    node.scale = (sc * half).tolist()
+    node.matrix = None
+
+
+def quantize_geometry(gltf: GLTF2, blob) -> tuple[dict[int, bytes], dict[str, int]]:
+    """Quantize float vertex attributes into normalized integer accessors.
+
+    NORMAL/TANGENT become int8, TEXCOORD (when in [0, 1]) and WEIGHTS become
+    uint16, and POSITION becomes int16 for unskinned, unmorphed leaf meshes
+    with the dequantization folded into their nodes. Only accessors used
+    purely as primitive attributes are touched, so indices, morph targets,
+    inverse bind matrices, animations and VRM/VRMC blocks keep their floats.
+
+    Edits accessor/bufferView/node metadata on `gltf` and returns
+    (bufferView replacements for `write_glb`, bytes saved per attribute).
+    """
+    import numpy as np
+
+    accessors = gltf.accessors or []
+    semantics: dict[int, set[str]] = {}
+    meshes_of: dict[int, set[int]] = {}
+    excluded: set[int] = set()
+    for m, mesh in enumerate(gltf.meshes or []):
+        for prim in mesh.primitives or []:
+            for semantic, a in _primitive_attributes(prim).items():
+                semantics.setdefault(a, set()).add(semantic)
+                meshes_of.setdefault(a, set()).add(m)
+            if prim.indices is not None:
+                excluded.add(prim.indices)
+            for target in prim.targets or []:
+                excluded.update(v for v in target.values() if isinstance(v, int))
+    for skin in gltf.skins or []:
+        if skin.inverseBindMatrices is not None:
+            excluded.add(skin.inverseBindMatrices)
+    for anim in gltf.animations or []:
+        for sampler in anim.samplers or []:
+            excluded.update((sampler.input, sampler.output))
+    for node in gltf.nodes or []:
+        inst = (node.extensions or {}).get("EXT_mesh_gpu_instancing") or {}
+        excluded.update(v for v in (inst.get("attributes") or {}).values() if isinstance(v, int))
+
+    position_meshes = _position_meshes(gltf)
+
+    def _eligible(a: int) -> str | None:
+        acc = accessors[a]
+        sems = semantics.get(a, set())
+        if a in excluded or len(sems) != 1 or acc.bufferView is None or acc.sparse is not None:
+            return None
+        if acc.componentType != FLOAT:
+            return None
+        family = _attribute_family(next(iter(sems)))
+        if family == "POSITION" and not meshes_of[a] <= position_meshes:
+            return None
+        if family in ("POSITION", "NORMAL", "TANGENT", "TEXCOORD", "WEIGHTS"):
+            return family
+        return None
+
+    # Mesh-level bounds, so all primitives of a mesh share one node transform.
+    mesh_bounds: dict[int, tuple] = {}
+
+    def _position_params(m: int):
+        if m not in mesh_bounds:
+            lo = np.full(3, np.inf)
+            hi = np.full(3, -np.inf)
+            for prim in gltf.meshes[m].primitives:
+                a = _primitive_attributes(prim).get("POSITION")
+                p = _read_float_accessor(gltf, blob, accessors[a])
+                lo = np.minimum(lo, p.min(axis=0))
+                hi = np.maximum(hi, p.max(axis=0))
+            center = (lo + hi) / 2.0
+            half = float(max((hi - lo).max() / 2.0, 1e-9))
+            mesh_bounds[m] = (center, half)
+        return mesh_bounds[m]
+
+    # Plan per bufferView: byteOffset slot -> family to quantize (None = copy
+    # as is). Interleaved views are repacked column by column; accessors at
+    # the same offset (duplicates merged by dedupe_buffer_views) are aliases
+    # and must agree.
+    slots_of: dict[int, dict[int, list[int]]] = {}
+    for a, acc in enumerate(accessors):
+        if acc.bufferView is not None:
+            slots_of.setdefault(acc.bufferView, {}).setdefault(acc.byteOffset or 0, []).append(a)
+
+    plan: dict[int, dict[int, str | None]] = {}
+    for bv_index, slots in slots_of.items():
+        bv = gltf.bufferViews[bv_index]
+        group = [accessors[a] for aliases in slots.values() for a in aliases]
+        if len(slots) > 1 and not bv.byteStride:
+            continue
+        if len({acc.count for acc in group}) != 1 or any(acc.type.startswith("MAT") for acc in group):
+            continue
+        if any(
+            len({(accessors[a].componentType, accessors[a].type) for a in aliases}) != 1
+            for aliases in slots.values()
+        ):
+            continue
+
+        slot_plan: dict[int, str | None] = {}
+        for offset, aliases in slots.items():
+            families = {_eligible(a) for a in aliases}
+            family = families.pop() if len(families) == 1 else None
+            if family == "POSITION" and (
+                accessors[aliases[0]].type != "VEC3"
+                or len(set().union(*(meshes_of[a] for a in aliases))) != 1
+            ):
+                family = None
+            slot_plan[offset] = family
+        if any(slot_plan.values()):
+            plan[bv_index] = slot_plan
+
+    # The node transform applies to the whole mesh: quantize POSITION for all
+    # of its primitives or for none.
+    for m in position_meshes:
+        slots = []
+        for prim in gltf.meshes[m].primitives or []:
+            a = _primitive_attributes(prim).get("POSITION")
+            if a is not None:
+                slots.append((accessors[a].bufferView, accessors[a].byteOffset or 0))
+        if not slots:
+            continue
+        if not all(plan.get(v, {}).get(off) == "POSITION" for v, off in slots):
+            for v, off in slots:
+                if v in plan and plan[v].get(off) == "POSITION":
+                    plan[v][off] = None
+        else:
+            _position_params(m)  # read bounds before any view is repacked
+
+    replacements: dict[int, bytes] = {}
+    saved: dict[str, int] = {}
+    requires_ext = False
+    for bv_index, slot_plan in plan.items():
+        if not any(slot_plan.values()):
+            continue
+        bv = gltf.bufferViews[bv_index]
+        slots = slots_of[bv_index]
+        first = accessors[next(iter(slots.values()))[0]]
+        count = first.count
+        stride_in = bv.byteStride or COMPONENT_SIZES[first.componentType] * TYPE_COMPONENTS[first.type]
+
+        columns = []
+        updates = []  # (aliases, new byteOffset, componentType or None, min, max, family)
+        saved_here: dict[str, int] = {}
+        col = 0
+        for offset in sorted(slot_plan):
+            aliases = slots[offset]
+            acc = accessors[aliases[0]]
+            family = slot_plan[offset]
+            q = None
+            if family:
+                data = _read_float_accessor(gltf, blob, acc)
+                if family == "POSITION":
+                    center, half = _position_params(next(iter(meshes_of[aliases[0]])))
+                    q, component, dtype = _quantize_snorm((data - center) / half, 16), SHORT, "<i2"
+                elif family in ("NORMAL", "TANGENT"):
+                    q, component, dtype = _quantize_snorm(data, 8), BYTE, "i1"
+                elif family == "TEXCOORD":
+                    if not data.size or (data.min() >= 0.0 and data.max() <= 1.0):
+                        q, component, dtype = np.rint(data * 65535), UNSIGNED_SHORT, "<u2"
+                else:  # WEIGHTS
+                    q, component, dtype = _quantize_weights(data), UNSIGNED_SHORT, "<u2"
+
+            if q is None:
+                size = COMPONENT_SIZES[acc.componentType] * TYPE_COMPONENTS[acc.type]
+                start = (bv.byteOffset or 0) + offset
+                raw = np.ndarray((count, size), dtype=np.uint8, buffer=blob, offset=start, strides=(stride_in, 1))
+                columns.append(_as_columns(raw))
+                updates.append((aliases, col, None, None, None, None))
+            else:
+                columns.append(_as_columns(q.astype(dtype)))
+                old_width = COMPONENT_SIZES[acc.componentType] * TYPE_COMPONENTS[acc.type]
+                saved_here[family] = saved_here.get(family, 0) + (old_width - columns[-1].shape[1]) * count
+                mins = q.min(axis=0).astype(int).tolist() if len(q) else None
+                maxs = q.max(axis=0).astype(int).tolist() if len(q) else None
+                updates.append((aliases, col, component, mins, maxs, family))
+                requires_ext = requires_ext or family in ("POSITION", "NORMAL", "TANGENT")
+            col += columns[-1].shape[1]
+
+        if not any(u[2] is not None for u in updates):
+            continue
+        packed = np.concatenate(columns, axis=1).tobytes()
+        for aliases, offset, component, mins, maxs, family in updates:
+            for a in aliases:
+                acc = accessors[a]
+                acc.byteOffset = offset
+                if component is not None:
+                    acc.componentType = component
+                    acc.normalized = True
+                    if family == "POSITION" or acc.min is not None:
+                        acc.min, acc.max = mins, maxs
+        for family, n in saved_here.items():
+            saved[family] = saved.get(family, 0) + n
+        replacements[bv_index] = packed
+        bv.byteStride = col
+
+    for m, (center, half) in mesh_bounds.items():
+        for node in gltf.nodes or []:
+            if node.mesh == m:
+                _apply_dequantization(node, center, half)
+
+    if requires_ext and replacements:
+        for attr in ("extensionsUsed", "extensionsRequired"):
+            names = getattr(gltf, attr, None) or []
+            if KHR_MESH_QUANTIZATION not in names:
+                setattr(gltf, attr, names + [KHR_MESH_QUANTIZATION])
+
+    return replacements, saved
+
+
+def _print_quantized(saved: dict[str, int]) -> None:
+    for family, nbytes in sorted(saved.items()):
+        print(f"Quantized {family}: -{nbytes / 1024:.1f}KB")
+
+
+def optimize_vrm_file(
+    input_path: Path,
+    output_path: Path,
+    *,
+    max_size: int,
+    webp_quality: int,
+    thumb_max: int,
+    thumb_quality: int,
+    normal_max: int,
+    normal_quality: int,
+    executor: Executor | None = None,
+    cache: EncodeCache | None = None,
+    dedupe: bool = True,
+    quantize: bool = False,
+    prune: bool = True,
+    on_report: Callable[[dict], None] | None = None,
+    target_ssim: float | None = None,
+) -> dict:
+    """Re-encode every embedded image; returns byte/texture counts for the file.
 
-    gltf2 = GLTF2().load_binary(str(output_path))
-    print("VRM detected (after):", is_vrm(gltf2))
-    print("Old size MB:", os.path.getsize(input_path) / (1024 * 1024))
-    print("New size MB:", os.path.getsize(output_path) / (1024 * 1024))
+    Pass a `ProcessPoolExecutor` as `executor` to encode the textures of the
+    file in parallel, and an `EncodeCache` to reuse earlier encodes.
+    `quantize` also shrinks vertex attributes (see `quantize_geometry`);
+    `prune` drops resources nothing references first (see `prune_unused`).
+    `on_report` turns on profiling and is called with the file's report
+    (stage timings, byte accounting, per-texture details; see `_file_report`),
+    which is also returned under "report". `target_ssim` encodes each
+    texture at the lowest quality meeting that SSIM (see `encode_texture_ssim`).
+    """
+    pending = _submit_vrm_file(
+        input_path,
+        output_path,
+        max_size=max_size,
+        webp_quality=webp_quality,
+        thumb_max=thumb_max,
+        thumb_quality=thumb_quality,
+        normal_max=normal_max,
+        normal_quality=normal_quality,
+        executor=executor,
+        cache=cache,
+        dedupe=dedupe,
+        quantize=quantize,
+        prune=prune,
+        profile=on_report is not None,
+        target_ssim=target_ssim,
+    )
+    stats = _finish_vrm_file(pending)
+    if on_report is not None:
+        on_report(stats["report"])
+    return stats
 
 
 def _candidate_settings_for_target(
@@ -230,6 +1568,96 @@ def _candidate_settings_for_target(
             }
 
 
+def _load_decoded_sources(
+    input_path: Path, dedupe: bool = True, quantize: bool = False, prune: bool = True
+):
+    """Load a GLB and decode each embedded image once.
+
+    Returns (source, sources, geometry) where `source` is the open
+    `GlbSource`, `geometry` holds bufferView replacements from
+    `quantize_geometry` (empty unless `quantize`), and sources maps
+    img_index -> (bv_index, kind, decoded image, sha256 of the raw bytes), one
+    entry per bufferView (keyed by its first image). Decodable images are
+    marked image/webp on `source.gltf` since every search mode replaces them.
+    """
+    source = GlbSource(input_path)
+    gltf = source.gltf
+    blob = source.bin
+
+    print(f"\n== {input_path.name} ==")
+    print("VRM detected (before):", is_vrm(gltf))
+    if not is_vrm(gltf) and input_path.suffix.lower() == ".vrm":
+        print("Warning: file does not look like VRM (continuing anyway).")
+
+    if not gltf.images and not quantize:
+        source.close()
+        raise NoImagesError(f"No images found in the model: {input_path.name}")
+
+    if prune:
+        _print_pruned(prune_unused(gltf))
+    if dedupe:
+        _print_dedupe(dedupe_buffer_views(gltf, blob))
+    geometry: dict[int, bytes] = {}
+    if quantize:
+        geometry, quantized = quantize_geometry(gltf, blob)
+        _print_quantized(quantized)
+
+    sources: dict[int, tuple[int, str, Image.Image, str]] = {}
+    for bv_index, (img_indices, kind) in images_by_view(gltf).items():
+        img_index = img_indices[0]
+        bv = gltf.bufferViews[bv_index]
+        off = bv.byteOffset or 0
+        ln = bv.byteLength or 0
+        with blob[off : off + ln] as raw:
+            try:
+                im = decode_image(raw)
+            except Exception as e:
+                print(f"Skipping image[{img_index}] (can't decode): {e}")
+                continue
+            digest = hashlib.sha256(raw).hexdigest()
+
+        sources[img_index] = (bv_index, kind, im, digest)
+        for i in img_indices:
+            gltf.images[i].mimeType = "image/webp"
+
+    return source, sources, geometry
+
+
+class _EncodeMemo:
+    """Encoded WebP bytes per (image, limit, quality), each computed at most once."""
+
+    def __init__(self, sources: dict, executor: Executor | None = None, cache: EncodeCache | None = None):
+        self.sources = sources
+        self.executor = executor
+        self.cache = cache
+        # (img_index, limit, quality) -> (future, cache key still to store under)
+        self._futures: dict[tuple[int, int, int], tuple[Future, str | None]] = {}
+
+    def submit(self, img_index: int, limit: int, quality: int) -> None:
+        """Queue an encode so several can run before any result is needed."""
+        key = (img_index, limit, quality)
+        if key not in self._futures:
+            _bv, _kind, im, digest = self.sources[img_index]
+            # Encodes from the full-resolution decode differ from encode_texture's
+            # draft/reduced decode, so they get their own cache entries.
+            self._futures[key] = _submit_encode(
+                self.executor, self.cache, f"{digest}:full-decode", encode_image, im, limit, quality
+            )
+
+    def get(self, img_index: int, limit: int, quality: int) -> bytes:
+        self.submit(img_index, limit, quality)
+        key = (img_index, limit, quality)
+        fut, cache_key = self._futures[key]
+        data = fut.result()
+        if cache_key is not None:
+            self.cache.put(cache_key, data)
+            self._futures[key] = (fut, None)
+        return data
+
+    def __len__(self) -> int:
+        return len(self._futures)
+
+
 def optimize_vrm_to_target(
     input_path: Path,
     output_path: Path,
@@ -242,15 +1670,37 @@ def optimize_vrm_to_target(
     normal_max: int,
     normal_quality: int,
     max_attempts: int = 12,
-) -> None:
+    executor: Executor | None = None,
+    cache: EncodeCache | None = None,
+    dedupe: bool = True,
+    quantize: bool = False,
+    prune: bool = True,
+) -> dict:
     """Try a small set of settings until the output meets target_mb.
 
-    IMPORTANT: Each attempt reloads the original file to avoid stacking lossy edits.
+    The source is loaded and every image decoded once; each attempt re-encodes
+    from those originals (no stacking of lossy edits), with encoded bytes
+    memoized per (image, max_size, quality). Attempt sizes are computed in
+    memory and only the chosen configuration is written to disk.
     """
 
     target_bytes = int(target_mb * 1024 * 1024)
+    input_bytes = os.path.getsize(input_path)
+
+    source, sources, geometry = _load_decoded_sources(input_path, dedupe, quantize, prune)
+    gltf = source.gltf
+    memo = _EncodeMemo(sources, executor, cache)
+
+    def _replacements(cfg: dict) -> dict[int, bytes]:
+        keys = {}
+        for img_index, (bv_index, kind, _im, _digest) in sources.items():
+            keys[bv_index] = (img_index, *settings_for_kind(kind, cfg))
+            memo.submit(*keys[bv_index])
+        return {**geometry, **{bv_index: memo.get(*key) for bv_index, key in keys.items()}}
+
     best_size = None
     best_cfg = None
+    best_replacements: dict[int, bytes] = {}
 
     attempts = 0
     for cfg in _candidate_settings_for_target(
@@ -263,6 +1713,7 @@ def optimize_vrm_to_target(
     ):
         attempts += 1
         if attempts > max_attempts:
+            attempts -= 1
             break
 
         print(
@@ -271,38 +1722,763 @@ def optimize_vrm_to_target(
             f"(max={cfg['max_size']}, q={cfg['webp_quality']}, thumb={cfg['thumb_max']}/{cfg['thumb_quality']}, normal={cfg['normal_max']}/{cfg['normal_quality']})",
         )
 
-        optimize_vrm_file(
-            input_path,
-            output_path,
-            max_size=cfg["max_size"],
-            webp_quality=cfg["webp_quality"],
-            thumb_max=cfg["thumb_max"],
-            thumb_quality=cfg["thumb_quality"],
-            normal_max=cfg["normal_max"],
-            normal_quality=cfg["normal_quality"],
-        )
+        replacements = _replacements(cfg)
+        out_size = estimate_glb_size(gltf, replacements)
+        print(f"  -> {out_size / (1024 * 1024):.2f}MB")
 
-        out_size = os.path.getsize(output_path)
         if best_size is None or out_size < best_size:
             best_size = out_size
             best_cfg = cfg
+            best_replacements = replacements
 
         if out_size <= target_bytes:
             print(
                 f"Hit target: {out_size / (1024 * 1024):.2f}MB <= {target_mb:.2f}MB",
             )
-            return
+            break
 
-    if best_size is not None and best_cfg is not None:
+    if best_size is not None and best_cfg is not None and best_size > target_bytes:
         print(
             f"Could not reach target {target_mb:.2f}MB within {attempts} attempts; best was {best_size / (1024 * 1024):.2f}MB",
             f"(max={best_cfg['max_size']}, q={best_cfg['webp_quality']}).",
         )
 
+    print(f"Re-encoded {len(sources)} embedded textures ({len(memo)} distinct encodes).")
+    write_vrm(source, best_replacements, output_path)
+    output_bytes = os.path.getsize(output_path)
+    print("Old size MB:", input_bytes / (1024 * 1024))
+    print("New size MB:", output_bytes / (1024 * 1024))
+
+    return {
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "textures": len({bv for bv, *_rest in sources.values()} & set(best_replacements)),
+    }
+
+
+# Relative cost of distortion per texture kind when allocating a byte budget.
+# Same priorities as the fixed ladder: normal maps stay sharpest, thumbnails
+# give way first.
+KIND_WEIGHTS = {"normal": 2.0, "general": 1.0, "thumb": 0.25}
+KIND_MIN_QUALITY = {"normal": 40, "general": 30, "thumb": 20}
+MIN_ALLOC_SIZE = 64
+
+
+def _candidate_settings_for_texture(kind: str, native_max: int, cfg: dict) -> list[tuple[int, int]]:
+    """(limit, quality) samples for one texture, best first.
+
+    Starts from the kind's configured settings (capped at the native size so
+    no two samples encode identically) and steps down resolution and quality.
+    """
+    limit, quality = settings_for_kind(kind, cfg)
+    top = min(limit, native_max)
+
+    sizes: list[int] = []
+    for factor in (1.0, 0.75, 0.5, 0.375, 0.25):
+        size = max(MIN_ALLOC_SIZE, int(round(top * factor)))
+        if size <= top and size not in sizes:
+            sizes.append(size)
+
+    floor = min(quality, KIND_MIN_QUALITY[kind])
+    qualities: list[int] = []
+    for q in (quality, quality - 10, quality - 20, quality - 30):
+        if q >= floor and q not in qualities:
+            qualities.append(q)
+
+    return [(size, q) for size in sizes for q in qualities]
+
+
+def _texture_distortion(reference: Image.Image, encoded: bytes) -> float:
+    """Mean squared error of `encoded`, scaled back up, against `reference`."""
+    im = decode_image(encoded)
+    if im.mode != reference.mode:
+        im = im.convert(reference.mode)
+    if im.size != reference.size:
+        im = im.resize(reference.size, Image.BICUBIC)
+    rms = ImageStat.Stat(ImageChops.difference(im, reference)).rms
+    return sum(r * r for r in rms) / len(rms)
+
+
+def _lower_hull(points: list[tuple[int, float]]) -> list[int]:
+    """Indices of the lower convex hull of (bytes, distortion), by ascending bytes.
+
+    Points that cost more bytes without lowering distortion are dropped first,
+    so every step along the hull trades bytes for quality at a falling rate.
+    """
+    order = sorted(range(len(points)), key=lambda i: (points[i][0], points[i][1]))
+    pareto: list[int] = []
+    for i in order:
+        if not pareto or points[i][1] < points[pareto[-1]][1]:
+            pareto.append(i)
+
+    hull: list[int] = []
+    for i in pareto:
+        while len(hull) >= 2:
+            (b0, d0), (b1, d1), (b2, d2) = points[hull[-2]], points[hull[-1]], points[i]
+            # Drop the middle point if it lies on or above the chord.
+            if (d1 - d0) * (b2 - b0) >= (d2 - d0) * (b1 - b0):
+                hull.pop()
+            else:
+                break
+        hull.append(i)
+    return hull
+
+
+def allocate_texture_budget(curves: dict[int, list[tuple[int, float]]], budget: int) -> dict[int, int]:
+    """Choose one sample per texture so the byte total fits `budget`.
+
+    `curves` maps texture -> [(bytes, weighted distortion), ...]. Every texture
+    starts at its largest hull point; the step with the smallest distortion
+    increase per byte saved is taken until the total fits. Returns texture ->
+    index into its curve (all at their smallest point if the budget cannot be met).
+    """
+    hulls = {key: _lower_hull(points) for key, points in curves.items()}
+    pos = {key: len(hull) - 1 for key, hull in hulls.items()}
+    total = sum(curves[key][hull[-1]][0] for key, hull in hulls.items())
+
+    def _push(heap: list, key: int) -> None:
+        p = pos[key]
+        if p == 0:
+            return
+        hull = hulls[key]
+        b_cur, d_cur = curves[key][hull[p]]
+        b_next, d_next = curves[key][hull[p - 1]]
+        heapq.heappush(heap, ((d_next - d_cur) / max(1, b_cur - b_next), key))
+
+    heap: list = []
+    for key in hulls:
+        _push(heap, key)
+
+    while total > budget and heap:
+        _, key = heapq.heappop(heap)
+        hull = hulls[key]
+        total -= curves[key][hull[pos[key]]][0] - curves[key][hull[pos[key] - 1]][0]
+        pos[key] -= 1
+        _push(heap, key)
+
+    return {key: hulls[key][pos[key]] for key in hulls}
+
+
+def optimize_vrm_allocated(
+    input_path: Path,
+    output_path: Path,
+    *,
+    target_mb: float,
+    max_size: int,
+    webp_quality: int,
+    thumb_max: int,
+    thumb_quality: int,
+    normal_max: int,
+    normal_quality: int,
+    executor: Executor | None = None,
+    cache: EncodeCache | None = None,
+    dedupe: bool = True,
+    quantize: bool = False,
+    prune: bool = True,
+) -> dict:
+    """Fit target_mb by choosing size/quality per texture instead of globally.
+
+    Each texture's bytes-vs-distortion curve is sampled (see
+    `_candidate_settings_for_texture`), distortion is weighted by pixel count
+    and `KIND_WEIGHTS`, and `allocate_texture_budget` spends the bytes left
+    after geometry/JSON where they buy the most quality.
+    """
+    target_bytes = int(target_mb * 1024 * 1024)
+    input_bytes = os.path.getsize(input_path)
+    cfg = {
+        "max_size": max_size,
+        "webp_quality": webp_quality,
+        "thumb_max": thumb_max,
+        "thumb_quality": thumb_quality,
+        "normal_max": normal_max,
+        "normal_quality": normal_quality,
+    }
+
+    source, sources, geometry = _load_decoded_sources(input_path, dedupe, quantize, prune)
+    gltf = source.gltf
+    memo = _EncodeMemo(sources, executor, cache)
+
+    candidates: dict[int, list[tuple[int, int]]] = {}
+    for img_index, (_bv, kind, im, _digest) in sources.items():
+        candidates[img_index] = _candidate_settings_for_texture(kind, max(im.size), cfg)
+        for limit, quality in candidates[img_index]:
+            memo.submit(img_index, limit, quality)
+
+    curves: dict[int, list[tuple[int, float]]] = {}
+    for img_index, cands in candidates.items():
+        _bv, kind, im, _digest = sources[img_index]
+        reference = resize_to_limit(im, cands[0][0])
+        weight = KIND_WEIGHTS[kind] * reference.width * reference.height
+        curve = []
+        for limit, quality in cands:
+            data = memo.get(img_index, limit, quality)
+            curve.append((len(pad4(data)), weight * _texture_distortion(reference, data)))
+        curves[img_index] = curve
+    print(f"Sampled {len(memo)} encodes across {len(sources)} textures.")
+
+    # Bytes not spent on textures: geometry, JSON, headers. Offsets change the
+    # JSON by a few digits, so re-check the exact size and tighten until it
+    # fits or no texture has a cheaper hull point left.
+    overhead = estimate_glb_size(gltf, {**geometry, **{bv: b"" for bv, *_rest in sources.values()}})
+    budget = target_bytes - overhead
+    previous = None
+    while True:
+        choice = allocate_texture_budget(curves, budget)
+        if choice == previous:
+            break  # every texture is already at its smallest point
+        replacements = {
+            **geometry,
+            **{sources[i][0]: memo.get(i, *candidates[i][c]) for i, c in choice.items()},
+        }
+        out_size = estimate_glb_size(gltf, replacements)
+        if out_size <= target_bytes:
+            break
+        previous = choice
+        # Below what this choice spends, so every pass takes at least one step.
+        spent = sum(curves[i][c][0] for i, c in choice.items())
+        budget = min(budget - (out_size - target_bytes), spent - 1)
+
+    for img_index in sorted(choice):
+        limit, quality = candidates[img_index][choice[img_index]]
+        kind = sources[img_index][1]
+        nbytes = len(replacements[sources[img_index][0]])
+        print(f"  image[{img_index}] {kind}: max={limit}, q={quality} -> {nbytes / 1024:.1f}KB")
+
+    if out_size <= target_bytes:
+        print(f"Hit target: {out_size / (1024 * 1024):.2f}MB <= {target_mb:.2f}MB")
+    else:
+        print(
+            f"Could not reach target {target_mb:.2f}MB; smallest allocation is {out_size / (1024 * 1024):.2f}MB",
+            f"(textures {sum(len(replacements[bv]) for bv, *_rest in sources.values()) / (1024 * 1024):.2f}MB, rest {overhead / (1024 * 1024):.2f}MB).",
+        )
+
+    print(f"Re-encoded {len(sources)} embedded textures.")
+    write_vrm(source, replacements, output_path)
+    output_bytes = os.path.getsize(output_path)
+    print("Old size MB:", input_bytes / (1024 * 1024))
+    print("New size MB:", output_bytes / (1024 * 1024))
+
+    return {
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "textures": len({bv for bv, *_rest in sources.values()} & set(replacements)),
+    }
+
+
+# --- Multi-tier output ------------------------------------------------------
+
+
+def parse_tiers(spec: str) -> list[tuple[str, int, int | None]]:
+    """Parse "desktop=1024:80,mobile=512" into [(name, max size, quality or None)]."""
+    tiers = []
+    for part in spec.split(","):
+        name, _, setting = part.strip().partition("=")
+        size, _, quality = setting.partition(":")
+        try:
+            tiers.append((name, int(size), int(quality) if quality else None))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad tier {part!r}; expected NAME=SIZE[:QUALITY]")
+        if not name or tiers[-1][1] <= 0:
+            raise argparse.ArgumentTypeError(f"bad tier {part!r}; expected NAME=SIZE[:QUALITY]")
+    if len({name for name, _, _ in tiers}) != len(tiers):
+        raise argparse.ArgumentTypeError("tier names must be unique")
+    return tiers
+
+
+def optimize_vrm_tiers(
+    input_path: Path,
+    tiers: list[tuple[str, int, int | None]],
+    *,
+    max_size: int,
+    webp_quality: int,
+    thumb_max: int,
+    thumb_quality: int,
+    normal_max: int,
+    normal_quality: int,
+    executor: Executor | None = None,
+    cache: EncodeCache | None = None,
+    dedupe: bool = True,
+    quantize: bool = False,
+    prune: bool = True,
+) -> dict:
+    """Write one output per tier from a single decode of every texture.
+
+    Each tier caps general textures at its size (and quality, default
+    `webp_quality`); normal maps and thumbnails keep their own settings,
+    capped at the tier size. Per texture, a resolution pyramid is built from
+    the largest level down, each level resampled from the one above rather
+    than from the original. Outputs are `<stem>_<tier><ext>` next to the
+    input, plus `<stem>_tiers.json` listing every tier's file and size.
+    `max_size` is unused: the tiers replace it. The returned stats count each
+    source texture once and give the largest tier's bytes as `output_bytes`
+    (per-tier bytes under "tiers"), so they compare with one default run.
+    """
+    input_bytes = os.path.getsize(input_path)
+    source, sources, geometry = _load_decoded_sources(input_path, dedupe, quantize, prune)
+    gltf = source.gltf
+
+    configs = [
+        {
+            "max_size": size,
+            "webp_quality": quality if quality is not None else webp_quality,
+            "thumb_max": min(thumb_max, size),
+            "thumb_quality": thumb_quality,
+            "normal_max": min(normal_max, size),
+            "normal_quality": normal_quality,
+        }
+        for _name, size, quality in tiers
+    ]
+
+    # Queue every level of every pyramid before waiting on any of them.
+    futures: dict[tuple[int, int, int], tuple[Future, str | None]] = {}
+    for img_index, (_bv, kind, im, digest) in sources.items():
+        wanted = {settings_for_kind(kind, cfg) for cfg in configs}
+        level, chain = im, digest
+        for limit in sorted({limit for limit, _q in wanted}, reverse=True):
+            level = resize_to_limit(level, limit)
+            chain += f">{limit}"  # cache key: the resampling path, not just the size
+            for quality in sorted(q for l, q in wanted if l == limit):
+                futures[(img_index, limit, quality)] = _submit_encode(
+                    executor, cache, chain, encode_image, level, limit, quality
+                )
+
+    manifest = {"source": input_path.name, "source_bytes": input_bytes, "tiers": []}
+    tier_bytes: dict[str, int] = {}
+    top_bytes = top_size = 0
+    try:
+        for (name, size, _quality), cfg in zip(tiers, configs):
+            replacements = dict(geometry)
+            for img_index, (bv_index, kind, _im, _digest) in sources.items():
+                key = (img_index, *settings_for_kind(kind, cfg))
+                fut, cache_key = futures[key]
+                replacements[bv_index] = fut.result()
+                if cache_key is not None:
+                    cache.put(cache_key, replacements[bv_index])
+                    futures[key] = (fut, None)
+
+            output_path = input_path.with_name(f"{input_path.stem}_{name}{input_path.suffix}")
+            print(f"Tier {name}: max={cfg['max_size']}, q={cfg['webp_quality']}")
+            write_vrm(source, replacements, output_path, close=False)
+            nbytes = os.path.getsize(output_path)
+            tier_bytes[name] = nbytes
+            if size > top_size:
+                top_bytes, top_size = nbytes, size
+            print(f"  {output_path.name}: {nbytes / (1024 * 1024):.2f}MB")
+            manifest["tiers"].append(
+                {
+                    "name": name,
+                    "file": output_path.name,
+                    "bytes": nbytes,
+                    "max_size": cfg["max_size"],
+                    "quality": cfg["webp_quality"],
+                }
+            )
+    finally:
+        source.close()
+
+    manifest_path = input_path.with_name(f"{input_path.stem}_tiers.json")
+    manifest_path.write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    print(f"Wrote {manifest_path.name} ({len(tiers)} tiers, {len(futures)} encodes).")
+
+    return {
+        "input_bytes": input_bytes,
+        "output_bytes": top_bytes,
+        "textures": len({bv for bv, *_rest in sources.values()}),
+        "tiers": tier_bytes,
+    }
+
+
+# --- Texture atlas packing (accessory GLBs) ---------------------------------
+
+ATLAS_GUTTER = 4  # edge-extended texels around each texture against bleeding
+ATLAS_UV_EPSILON = 1e-3
+ARRAY_BUFFER = 34962
+
+
+def _atlas_materials(gltf: GLTF2, blob) -> dict[int, tuple[int, list]]:
+    """Materials whose only texture can move into an atlas.
+
+    Returns material index -> (texture index, [(primitive, TEXCOORD semantic,
+    uv array)]). A material qualifies when it has a single textureInfo, the
+    base color one, with no texture transform, and every primitive drawn
+    with it has float UVs for that set inside [0, 1]; anything tiling or
+    sampling several maps would need all of them moved together.
+    """
+    import numpy as np
+
+    prims_by_material: dict[int, list] = {}
+    for mesh in gltf.meshes or []:
+        for prim in mesh.primitives or []:
+            if prim.material is not None:
+                prims_by_material.setdefault(prim.material, []).append(prim)
+
+    found: dict[int, tuple[int, list]] = {}
+    for mi, material in enumerate(gltf.materials or []):
+        infos = list(_texture_infos(material))
+        base = material.pbrMetallicRoughness.baseColorTexture if material.pbrMetallicRoughness else None
+        if len(infos) != 1 or infos[0] is not base or base.extensions:
+            continue
+        tex = gltf.textures[base.index]
+        if tex.source is None or tex.extensions or gltf.images[tex.source].bufferView is None:
+            continue
+        semantic = f"TEXCOORD_{base.texCoord or 0}"
+        uses = []
+        for prim in prims_by_material.get(mi, []):
+            a = _primitive_attributes(prim).get(semantic)
+            acc = gltf.accessors[a] if a is not None else None
+            if (
+                acc is None
+                or acc.componentType != FLOAT
+                or acc.type != "VEC2"
+                or acc.bufferView is None
+                or acc.sparse is not None
+            ):
+                break
+            uv = _read_float_accessor(gltf, blob, acc)
+            if uv.size and (uv.min() < -ATLAS_UV_EPSILON or uv.max() > 1 + ATLAS_UV_EPSILON):
+                break
+            uses.append((prim, semantic, a, uv))
+        else:
+            if uses:
+                found[mi] = (base.index, uses)
+    return found
+
+
+def pack_atlas(sizes: dict, atlas_size: int) -> tuple[dict, list[tuple[int, int]]]:
+    """Shelf-pack rectangles of `sizes` (key -> (w, h)) onto atlas pages.
+
+    Tallest first, left to right, opening a shelf below when a row is full
+    and a new page when the page is. Returns (key -> (page, x, y), page
+    sizes), pages cropped to the area actually used.
+    """
+    placements: dict = {}
+    pages: list[tuple[int, int]] = []
+    x = y = shelf = 0
+    for key in sorted(sizes, key=lambda k: (-sizes[k][1], -sizes[k][0])):
+        w, h = sizes[key]
+        if w > atlas_size or h > atlas_size:
+            raise ValueError(f"{w}x{h} does not fit a {atlas_size}px atlas")
+        if not pages or x + w > atlas_size:
+            x, y, shelf = 0, y + shelf, 0
+        if not pages or y + h > atlas_size:
+            pages.append((0, 0))
+            x = y = shelf = 0
+        placements[key] = (len(pages) - 1, x, y)
+        pw, ph = pages[-1]
+        pages[-1] = (max(pw, x + w), max(ph, y + h))
+        x += w
+        shelf = max(shelf, h)
+    return placements, pages
+
+
+def _atlas_page(images: dict, placements: dict, page: int, size: tuple[int, int]) -> Image.Image:
+    import numpy as np
+
+    g = ATLAS_GUTTER
+    canvas = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+    for key, (p, x, y) in placements.items():
+        if p != page:
+            continue
+        rgba = np.asarray(images[key].convert("RGBA"))
+        h, w = rgba.shape[:2]
+        canvas[y : y + h + 2 * g, x : x + w + 2 * g] = np.pad(rgba, ((g, g), (g, g), (0, 0)), mode="edge")
+    im = Image.fromarray(canvas, "RGBA")
+    if im.getextrema()[3] == (255, 255):
+        im = im.convert("RGB")
+    return im
+
+
+def optimize_glbs_to_atlas(
+    targets: list[tuple[Path, Path]],
+    out_dir: Path,
+    *,
+    atlas_size: int,
+    atlas_name: str = "atlas",
+    max_size: int,
+    webp_quality: int,
+    thumb_max: int,
+    thumb_quality: int,
+    normal_max: int,
+    normal_quality: int,
+    executor: Executor | None = None,
+    cache: EncodeCache | None = None,
+    dedupe: bool = True,
+    quantize: bool = False,
+    prune: bool = True,
+) -> tuple[list[dict], int]:
+    """Pack the base color textures of several GLBs into shared atlas pages.
+
+    Identical textures across files take one slot. Each atlas page is
+    written once as `<out_dir>/<atlas_name>-<page>.webp` and referenced by
+    URI from every GLB that uses it, so a client fetches and uploads it once
+    and draws those materials without texture switches. TEXCOORD data is
+    rewritten into the packed rectangle (new accessors, so UVs shared with
+    other materials are untouched); textures that can't be atlased (see
+    `_atlas_materials`) are re-encoded in place as usual. Files without
+    embedded images are skipped.
+
+    Returns (per-file stats, bytes written for atlas pages).
+    """
+    import numpy as np
+
+    if quantize:
+        raise ValueError("Atlas packing does not combine with geometry quantization.")
+    limit = min(max_size, atlas_size - 2 * ATLAS_GUTTER)
+
+    # Pass 1: open every file and decide what moves into the atlas.
+    opened: list[tuple[Path, Path, GlbSource, tuple[int, int], dict, dict]] = []
+    images: dict[str, Image.Image] = {}
+    for input_path, output_path in targets:
+        source = GlbSource(input_path)
+        gltf = source.gltf
+        if not gltf.images:
+            print(f"Skipping {input_path.name} (no embedded images).")
+            source.close()
+            continue
+        deduped = dedupe_buffer_views(gltf, source.bin) if dedupe else (0, 0)
+        slots: dict[int, str] = {}  # material index -> atlas key
+        materials = _atlas_materials(gltf, source.bin)
+        for mi, (tex_index, _uses) in materials.items():
+            bv = gltf.bufferViews[gltf.images[gltf.textures[tex_index].source].bufferView]
+            off = bv.byteOffset or 0
+            with source.bin[off : off + (bv.byteLength or 0)] as raw:
+                key = hashlib.sha256(raw).hexdigest()
+                if key not in images:
+                    try:
+                        images[key] = resize_to_limit(decode_image(bytes(raw), limit), limit)
+                    except Exception as e:
+                        print(f"{input_path.name}: not atlasing material[{mi}] (can't decode): {e}")
+                        continue
+            slots[mi] = key
+        opened.append((input_path, output_path, source, deduped, {mi: materials[mi] for mi in slots}, slots))
+
+    if not opened:
+        return [], 0
+
+    # Pass 2: pack and write the pages.
+    g = ATLAS_GUTTER
+    sizes = {key: (im.width + 2 * g, im.height + 2 * g) for key, im in images.items()}
+    placements, pages = pack_atlas(sizes, atlas_size)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    atlas_bytes = 0
+    page_uris = []
+    for page, size in enumerate(pages):
+        data = encode_image(_atlas_page(images, placements, page, size), max(size), webp_quality)
+        uri = f"{atlas_name}-{page}.webp"
+        (out_dir / uri).write_bytes(data)
+        atlas_bytes += len(data)
+        page_uris.append(uri)
+        print(f"Atlas {uri}: {size[0]}x{size[1]}, {len(data) / 1024:.1f}KB")
+    print(f"Packed {len(images)} texture(s) onto {len(pages)} atlas page(s).")
+
+    # Pass 3: point each file's materials and UVs at the atlas, then write it.
+    settings = dict(
+        max_size=max_size,
+        webp_quality=webp_quality,
+        thumb_max=thumb_max,
+        thumb_quality=thumb_quality,
+        normal_max=normal_max,
+        normal_quality=normal_quality,
+    )
+    stats = []
+    for input_path, output_path, source, deduped, materials, slots in opened:
+        gltf = source.gltf
+        replacements: dict[int, bytes] = {}
+        page_images: dict[int, int] = {}
+        page_textures: dict[tuple[int, int | None], int] = {}
+        new_uvs: dict[tuple[int, str], int] = {}
+        for mi, (tex_index, uses) in materials.items():
+            key = slots[mi]
+            page, x, y = placements[key]
+            pw, ph = pages[page]
+            im = images[key]
+            scale = np.array([im.width / pw, im.height / ph])
+            offset = np.array([(x + g) / pw, (y + g) / ph])
+
+            if page not in page_images:
+                page_images[page] = len(gltf.images)
+                gltf.images.append(GltfImage(uri=page_uris[page], mimeType="image/webp", name=f"{atlas_name}-{page}"))
+            sampler = gltf.textures[tex_index].sampler
+            if (page, sampler) not in page_textures:
+                page_textures[(page, sampler)] = len(gltf.textures)
+                gltf.textures.append(Texture(source=page_images[page], sampler=sampler))
+            gltf.materials[mi].pbrMetallicRoughness.baseColorTexture.index = page_textures[(page, sampler)]
+
+            for prim, semantic, a, uv in uses:
+                if (a, key) not in new_uvs:
+                    packed = (np.clip(uv, 0.0, 1.0) * scale + offset).astype("<f4")
+                    bv_index = len(gltf.bufferViews)
+                    replacements[bv_index] = packed.tobytes()
+                    gltf.bufferViews.append(
+                        BufferView(buffer=0, byteOffset=0, byteLength=packed.nbytes, target=ARRAY_BUFFER)
+                    )
+                    new_uvs[(a, key)] = len(gltf.accessors)
+                    gltf.accessors.append(
+                        Accessor(
+                            bufferView=bv_index,
+                            componentType=FLOAT,
+                            count=len(packed),
+                            type="VEC2",
+                            min=packed.min(axis=0).tolist() if len(packed) else None,
+                            max=packed.max(axis=0).tolist() if len(packed) else None,
+                        )
+                    )
+                attrs = prim.attributes if isinstance(prim.attributes, dict) else vars(prim.attributes)
+                attrs[semantic] = new_uvs[(a, key)]
+
+        # Drop the textures/images/UVs the atlas replaced.
+        pruned = prune_unused(gltf, replacements) if prune else {}
+        if not gltf.images:
+            print(f"Skipping {input_path.name} (no images in use).")
+            source.close()
+            continue
+        pending = _submit_vrm_file(
+            input_path,
+            output_path,
+            executor=executor,
+            cache=cache,
+            dedupe=False,
+            quantize=False,
+            prune=False,
+            source=source,
+            replacements=replacements,
+            **settings,
+        )
+        pending.pruned = pruned
+        pending.deduped = deduped
+        stats.append(_finish_vrm_file(pending))
+    return stats, atlas_bytes
+
+
+# --- Watch mode -------------------------------------------------------------
+
+WATCH_MANIFEST = ".vrm_optimizer_manifest.json"
+WATCH_SUFFIXES = (".vrm", ".glb")
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _scan_sources(root: Path, suffix: str, outputs: set[str]) -> dict[str, tuple[int, int]]:
+    """Relative path -> (size, mtime_ns) of every source file under `root`.
+
+    Our own outputs (recorded ones, or anything named `*<suffix>.<ext>`) and
+    hidden files (temp files while writing) are not sources.
+    """
+    found = {}
+    for path in root.rglob("*"):
+        if path.suffix.lower() not in WATCH_SUFFIXES or path.name.startswith("."):
+            continue
+        rel = path.relative_to(root).as_posix()
+        if rel in outputs or path.stem.endswith(suffix):
+            continue
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        found[rel] = (st.st_size, st.st_mtime_ns)
+    return found
+
+
+def watch_directory(
+    root: Path,
+    optimize: Callable[[Path, Path], dict],
+    *,
+    suffix: str,
+    settings_key: str,
+    interval: float = 2.0,
+    once: bool = False,
+) -> int:
+    """Keep optimized outputs under `root` in sync with their sources.
+
+    Polls every `interval` seconds (no platform file-watching APIs). The
+    manifest in `root` maps each source to its sha256, the settings it was
+    built with and its output, so only new or changed sources (content or
+    settings) are optimized, also across restarts. A file is picked up once
+    its size/mtime stayed the same for one poll, so half-copied uploads are
+    left alone. Outputs of deleted sources are removed. Models without
+    embedded images are recorded as skipped rather than failed. `once` does
+    a single sync pass and returns; otherwise runs until interrupted. Returns
+    the number of failed files in the last pass.
+    """
+    manifest_path = root / WATCH_MANIFEST
+    try:
+        entries: dict[str, dict] = json.loads(manifest_path.read_text(encoding="utf-8"))["files"]
+    except FileNotFoundError:
+        entries = {}
+    pending: dict[str, tuple[int, int]] = {}  # changed last poll; waiting to settle
+
+    def save() -> None:
+        tmp = manifest_path.with_name(f".{manifest_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"version": 1, "files": entries}, indent=2) + "\n", encoding="utf-8")
+        os.replace(tmp, manifest_path)
+
+    print(f"Watching {root} ({len(entries)} file(s) in manifest).")
+    while True:
+        failures = 0
+        changed = False
+        outputs = {e["output"] for e in entries.values() if e.get("output")}
+        current = _scan_sources(root, suffix, outputs)
+
+        for rel in sorted(set(entries) - set(current)):
+            output = entries.pop(rel).get("output")
+            if output:
+                (root / output).unlink(missing_ok=True)
+            print(f"Removed {rel} (source deleted{f'; deleted {output}' if output else ''}).")
+            changed = True
+
+        for rel, stat in sorted(current.items()):
+            entry = entries.get(rel)
+            if entry is not None and (entry["size"], entry["mtime_ns"]) == stat and entry["settings"] == settings_key:
+                continue
+            if not once and pending.get(rel) != stat:
+                pending[rel] = stat  # still being written? look again next poll
+                continue
+            pending.pop(rel, None)
+
+            input_path = root / rel
+            digest = _file_sha256(input_path)
+            if entry is not None and entry["sha256"] == digest and entry["settings"] == settings_key:
+                entry["size"], entry["mtime_ns"] = stat  # touched, not changed
+                changed = True
+                continue
+
+            output_path = input_path.with_name(f"{input_path.stem}{suffix}{input_path.suffix}")
+            record = {"sha256": digest, "settings": settings_key, "size": stat[0], "mtime_ns": stat[1]}
+            try:
+                stats = optimize(input_path, output_path)
+                record.update(output=output_path.relative_to(root).as_posix(), output_bytes=stats["output_bytes"])
+            except NoImagesError:
+                # Not applicable, not a failure (with --quantize these do get optimized).
+                record["skipped"] = "no embedded images"
+                print(f"Skipped {rel}: no embedded images.")
+            except (Exception, SystemExit) as e:
+                failures += 1
+                record["error"] = str(e)
+                print(f"Failed {rel}: {e}")
+            old_output = (entry or {}).get("output")
+            if old_output and old_output != record.get("output"):
+                (root / old_output).unlink(missing_ok=True)  # e.g. built under a previous --suffix
+                print(f"Deleted {old_output} (superseded).")
+            entries[rel] = record
+            changed = True
+
+        pending = {rel: stat for rel, stat in pending.items() if rel in current}
+        if changed:
+            save()
+        if once:
+            return failures
+        time.sleep(interval)
+
 
 def main() -> int:
     p = argparse.ArgumentParser(description="Optimize embedded textures inside a VRM (GLB).")
-    p.add_argument("inputs", nargs="+", help="One or more .vrm file paths")
+    p.add_argument("inputs", nargs="*", help="One or more .vrm file paths (.glb too with --atlas-dir)")
     p.add_argument(
         "--suffix",
         default="_optimized_5mb",
@@ -318,7 +2494,13 @@ def main() -> int:
         "--target-mb",
         type=float,
         default=None,
-        help="Try a small set of settings to reach this size (MB). Each attempt reloads the original input (no stacking).",
+        help="Try a small set of settings to reach this size (MB). Each attempt re-encodes from the decoded originals (no stacking).",
+    )
+
+    p.add_argument(
+        "--allocate",
+        action="store_true",
+        help="With --target-mb, pick size/quality per texture to fit the byte budget instead of one global settings ladder.",
     )
 
     # Defaults match your original script
@@ -329,12 +2511,120 @@ def main() -> int:
     p.add_argument("--normal-max", type=int, default=512, help="Max dimension for normal maps")
     p.add_argument("--normal-quality", type=int, default=70, help="WebP quality for normal maps")
 
+    p.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for texture encoding, shared across files (0 = all cores, default: 1 = serial).",
+    )
+
+    p.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Directory for a persistent encode cache keyed by texture content + settings (default: disabled).",
+    )
+    p.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=512,
+        help="Size cap for --cache-dir; least recently used entries are evicted (default: 512).",
+    )
+
+    p.add_argument(
+        "--quantize-geometry",
+        action="store_true",
+        help="Also quantize vertex attributes to normalized integers (adds KHR_mesh_quantization).",
+    )
+    p.add_argument(
+        "--no-dedupe",
+        action="store_true",
+        help="Keep duplicate bufferViews/images instead of merging identical payloads.",
+    )
+    p.add_argument(
+        "--no-prune",
+        action="store_true",
+        help="Keep unreferenced meshes, accessors, textures and images instead of dropping them.",
+    )
+
+    p.add_argument(
+        "--atlas-dir",
+        type=Path,
+        default=None,
+        help="Pack the base color textures of all inputs (.glb/.vrm) into shared atlas pages and write the GLBs and pages here.",
+    )
+    p.add_argument("--atlas-size", type=int, default=2048, help="Max atlas page dimension (default: 2048)")
+    p.add_argument("--atlas-name", default="atlas", help="File name prefix for atlas pages (default: atlas)")
+
+    p.add_argument(
+        "--tiers",
+        type=parse_tiers,
+        default=None,
+        help="Write several variants in one pass, e.g. desktop=1024:75,mobile=512:60 (NAME=SIZE[:QUALITY]); outputs <stem>_<name>.vrm plus <stem>_tiers.json.",
+    )
+
+    p.add_argument(
+        "--report",
+        choices=["json"],
+        default=None,
+        help="Profile each file (stage timings, byte accounting, per-texture details) and write a report.",
+    )
+    p.add_argument(
+        "--report-path",
+        type=Path,
+        default=Path("vrm_optimizer_report.json"),
+        help="Where --report writes (default: vrm_optimizer_report.json).",
+    )
+
+    p.add_argument(
+        "--target-ssim",
+        type=float,
+        default=None,
+        help="Encode each texture at the lowest quality whose SSIM vs. the resized source meets this (e.g. 0.97); the quality flags become the first probe.",
+    )
+
+    p.add_argument(
+        "--watch",
+        type=Path,
+        default=None,
+        metavar="DIR",
+        help="Keep optimized copies of every .vrm/.glb under DIR up to date, polling for new, changed and deleted files.",
+    )
+    p.add_argument("--watch-interval", type=float, default=2.0, help="Seconds between --watch polls (default: 2).")
+    p.add_argument("--once", action="store_true", help="With --watch, sync once and exit instead of polling.")
+
     args = p.parse_args()
+    if args.watch is None and not args.inputs:
+        p.error("give input files or --watch DIR")
+    if args.watch is not None and (args.inputs or args.inplace or args.tiers is not None or args.atlas_dir is not None):
+        p.error("--watch takes no input files and can't be combined with --inplace, --tiers or --atlas-dir")
+    if args.watch is not None and not args.suffix:
+        p.error("--watch needs a non-empty --suffix (outputs written over their sources would be picked up again)")
+    if args.target_ssim is not None and (
+        args.target_mb is not None or args.tiers is not None or args.atlas_dir is not None
+    ):
+        p.error("--target-ssim is only supported in the default mode (not with --target-mb, --tiers or --atlas-dir)")
+    if args.target_ssim is not None and not 0 < args.target_ssim <= 1:
+        p.error("--target-ssim must be in (0, 1]")
+    if args.report is not None and (args.target_mb is not None or args.tiers is not None or args.atlas_dir):
+        p.error("--report is only supported in the default mode (not with --target-mb, --tiers or --atlas-dir)")
+    if args.tiers is not None and (args.target_mb is not None or args.inplace or args.atlas_dir is not None):
+        p.error("--tiers can't be combined with --target-mb, --inplace or --atlas-dir")
+    if args.atlas_dir is not None and (args.target_mb is not None or args.inplace or args.quantize_geometry):
+        p.error("--atlas-dir can't be combined with --target-mb, --inplace or --quantize-geometry")
 
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    targets: list[tuple[Path, Path]] = []
     for raw in args.inputs:
         input_path = Path(raw).expanduser().resolve()
         if not input_path.exists():
             raise SystemExit(f"Input not found: {input_path}")
+        if args.atlas_dir is not None:
+            if input_path.suffix.lower() not in (".glb", ".vrm"):
+                raise SystemExit(f"Not a .glb/.vrm file: {input_path}")
+            targets.append((input_path, args.atlas_dir.expanduser().resolve() / input_path.name))
+            continue
         if input_path.suffix.lower() != ".vrm":
             raise SystemExit(f"Not a .vrm file: {input_path}")
 
@@ -342,33 +2632,156 @@ def main() -> int:
             output_path = input_path
         else:
             output_path = input_path.with_name(f"{input_path.stem}{args.suffix}{input_path.suffix}")
+        targets.append((input_path, output_path))
+
+    settings = dict(
+        max_size=args.max_size,
+        webp_quality=args.webp_quality,
+        thumb_max=args.thumb_max,
+        thumb_quality=args.thumb_quality,
+        normal_max=args.normal_max,
+        normal_quality=args.normal_quality,
+        dedupe=not args.no_dedupe,
+        quantize=args.quantize_geometry,
+        prune=not args.no_prune,
+    )
 
-        if args.target_mb is not None:
-            optimize_vrm_to_target(
-                input_path,
-                output_path,
-                target_mb=args.target_mb,
-                max_size=args.max_size,
-                webp_quality=args.webp_quality,
-                thumb_max=args.thumb_max,
-                thumb_quality=args.thumb_quality,
-                normal_max=args.normal_max,
-                normal_quality=args.normal_quality,
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    cache = None
+    if args.cache_dir is not None:
+        cache = EncodeCache(args.cache_dir.expanduser(), int(args.cache_max_mb * 1024 * 1024))
+    totals = {"files": 0, "input_bytes": 0, "output_bytes": 0, "textures": 0}
+    reports: list[dict] = []
+    exit_code = 0
+    t0 = time.perf_counter()
+
+    def _add(stats: dict) -> None:
+        totals["files"] += 1
+        for key in ("input_bytes", "output_bytes", "textures"):
+            totals[key] += stats.get(key, 0)
+        if "report" in stats:
+            reports.append(stats["report"])
+
+    try:
+        if args.watch is not None:
+
+            def optimize_one(input_path: Path, output_path: Path) -> dict:
+                if args.target_mb is None:
+                    stats = optimize_vrm_file(
+                        input_path,
+                        output_path,
+                        executor=executor,
+                        cache=cache,
+                        target_ssim=args.target_ssim,
+                        **settings,
+                    )
+                else:
+                    optimize = optimize_vrm_allocated if args.allocate else optimize_vrm_to_target
+                    stats = optimize(
+                        input_path, output_path, target_mb=args.target_mb, executor=executor, cache=cache, **settings
+                    )
+                _add(stats)
+                return stats
+
+            # A change to any of these rebuilds every file.
+            settings_key = json.dumps(
+                dict(
+                    settings,
+                    target_mb=args.target_mb,
+                    allocate=args.allocate,
+                    target_ssim=args.target_ssim,
+                    suffix=args.suffix,
+                    mode=ENCODE_MODE,
+                ),
+                sort_keys=True,
             )
-        else:
-            optimize_vrm_file(
-                input_path,
-                output_path,
-                max_size=args.max_size,
-                webp_quality=args.webp_quality,
-                thumb_max=args.thumb_max,
-                thumb_quality=args.thumb_quality,
-                normal_max=args.normal_max,
-                normal_quality=args.normal_quality,
+            try:
+                failures = watch_directory(
+                    args.watch.expanduser().resolve(),
+                    optimize_one,
+                    suffix=args.suffix,
+                    settings_key=settings_key,
+                    interval=args.watch_interval,
+                    once=args.once,
+                )
+            except KeyboardInterrupt:
+                print("\nStopped watching.")
+                failures = 0
+            if failures:
+                print(f"{failures} file(s) failed.")
+                exit_code = 1
+        elif args.atlas_dir is not None:
+            stats, atlas_bytes = optimize_glbs_to_atlas(
+                targets,
+                args.atlas_dir.expanduser().resolve(),
+                atlas_size=args.atlas_size,
+                atlas_name=args.atlas_name,
+                executor=executor,
+                cache=cache,
+                **settings,
             )
+            for file_stats in stats:
+                _add(file_stats)
+            totals["output_bytes"] += atlas_bytes
+        elif args.tiers is not None:
+            for input_path, _output_path in targets:
+                _add(optimize_vrm_tiers(input_path, args.tiers, executor=executor, cache=cache, **settings))
+        elif args.target_mb is not None:
+            # Attempts depend on the previous result, so files go one at a time;
+            # textures within each attempt still use the pool.
+            optimize = optimize_vrm_allocated if args.allocate else optimize_vrm_to_target
+            for input_path, output_path in targets:
+                _add(
+                    optimize(
+                        input_path,
+                        output_path,
+                        target_mb=args.target_mb,
+                        executor=executor,
+                        cache=cache,
+                        **settings,
+                    )
+                )
+        else:
+            # Keep up to `jobs` files queued on the pool so workers stay busy
+            # across file boundaries; results are written in input order.
+            window: list[_PendingFile] = []
+            profile = args.report is not None
+            for input_path, output_path in targets:
+                window.append(
+                    _submit_vrm_file(
+                        input_path,
+                        output_path,
+                        executor=executor,
+                        cache=cache,
+                        profile=profile,
+                        target_ssim=args.target_ssim,
+                        **settings,
+                    )
+                )
+                if len(window) >= jobs:
+                    _add(_finish_vrm_file(window.pop(0)))
+            while window:
+                _add(_finish_vrm_file(window.pop(0)))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    in_mb = totals["input_bytes"] / (1024 * 1024)
+    out_mb = totals["output_bytes"] / (1024 * 1024)
+    print(
+        f"\nProcessed {totals['files']} file(s), {totals['textures']} textures in {elapsed:.2f}s "
+        f"with {jobs} job(s): {in_mb:.2f}MB -> {out_mb:.2f}MB, "
+        f"{in_mb / elapsed:.2f} MB/s, {totals['textures'] / elapsed:.2f} textures/s"
+    )
+    if cache is not None:
+        print(cache.summary())
+    if args.report is not None:
+        args.report_path.write_text(json.dumps({"files": reports}, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote report for {len(reports)} file(s) to {args.report_path}")
 
-    return 0
+    return exit_code
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
\ No newline at end of file
+    raise SystemExit(main())
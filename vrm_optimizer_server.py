@@ -0,0 +1,310 @@
+"""Local optimization service for vrm_optimizer.
+
+Keeps a pool of pre-warmed worker processes (interpreter, PIL and pygltflib
+already loaded) and optimizes GLB/VRM bytes posted over HTTP, on a TCP port
+or a Unix socket. At most --workers files run at once and at most
+--max-queue more wait; beyond that requests get 503 + Retry-After instead
+of piling up.
+
+Endpoints:
+    POST /optimize   body = GLB bytes; optional query: target_mb, max_size,
+                     webp_quality, thumb_max, thumb_quality, normal_max,
+                     normal_quality, target_ssim, quantize=1, allocate=1.
+                     Returns the optimized GLB with a compact X-Optimizer-Stats
+                     header, or with `Accept: application/json` a JSON body
+                     {"stats", "glb_base64"} where stats includes the per-stage
+                     report (default mode only).
+    GET  /metrics    request counts, in-flight/queue depth, latency percentiles.
+    GET  /healthz    "ok".
+
+Example:
+    python vrm_optimizer_server.py --port 8787 --workers 4
+    curl --data-binary @avatar.vrm -o out.vrm "http://127.0.0.1:8787/optimize?target_mb=5"
+    curl http://127.0.0.1:8787/metrics
+
+Smoke test (ephemeral localhost port): python smoke_vrm_optimizer_server.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import vrm_optimizer as vo
+
+DEFAULT_SETTINGS = dict(
+    max_size=512,
+    webp_quality=60,
+    thumb_max=512,
+    thumb_quality=45,
+    normal_max=512,
+    normal_quality=70,
+)
+INT_OPTIONS = ("max_size", "webp_quality", "thumb_max", "thumb_quality", "normal_max", "normal_quality")
+FLOAT_OPTIONS = ("target_mb", "target_ssim")
+FLAG_OPTIONS = ("quantize", "allocate")
+LATENCY_WINDOW = 1000  # most recent requests kept for percentiles
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+def optimize_bytes(data: bytes, name: str, options: dict) -> tuple[bytes, dict]:
+    """Optimize one GLB payload in a worker process; returns (bytes, stats)."""
+    t0 = time.perf_counter()
+    options = dict(options)
+    target_mb = options.pop("target_mb", None)
+    allocate = options.pop("allocate", False)
+    target_ssim = options.pop("target_ssim", None)
+    reports: list[dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = Path(tmp) / name
+        output_path = Path(tmp) / f"out-{name}"
+        input_path.write_bytes(data)
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            if target_mb is not None:
+                optimize = vo.optimize_vrm_allocated if allocate else vo.optimize_vrm_to_target
+                stats = optimize(input_path, output_path, target_mb=target_mb, **options)
+            else:
+                stats = vo.optimize_vrm_file(
+                    input_path, output_path, on_report=reports.append, target_ssim=target_ssim, **options
+                )
+        out = output_path.read_bytes()
+    stats = {k: v for k, v in stats.items() if k != "report"}
+    stats["worker_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    stats["worker_pid"] = os.getpid()
+    if reports:
+        stats["report"] = reports[0]
+    return out, stats
+
+
+class _Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "rejected": 0}
+        self.in_flight = 0
+        self.latencies_ms: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.queue_ms: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self, workers: int, max_queue: int) -> dict:
+        with self.lock:
+            lat = sorted(self.latencies_ms)
+            waits = sorted(self.queue_ms)
+            return {
+                **self.counts,
+                "in_flight": self.in_flight,
+                # The pool runs `workers` jobs at a time; the rest are waiting.
+                "queue_depth": max(0, self.in_flight - workers),
+                "workers": workers,
+                "max_queue": max_queue,
+                "latency_ms": _percentiles(lat),
+                "queue_wait_ms": _percentiles(waits),
+            }
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))], 3)  # noqa: E731
+    return {"count": len(values), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1], 3)}
+
+
+class OptimizerService:
+    """Warm process pool plus the admission control shared by all handlers."""
+
+    def __init__(self, workers: int, max_queue: int, max_upload_bytes: int, defaults: dict):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_upload_bytes = max_upload_bytes
+        self.defaults = defaults
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        # One slot per running or queued request; a full house means 503.
+        self.slots = threading.BoundedSemaphore(workers + max_queue)
+        self.metrics = _Metrics()
+        pids = {f.result() for f in [self.pool.submit(_warm_up) for _ in range(workers * 2)]}
+        print(f"Warmed {len(pids)} worker process(es).")
+
+    def options_from_query(self, query: str) -> dict:
+        params = {k: v[-1] for k, v in parse_qs(query).items()}
+        options = dict(self.defaults)
+        for key in INT_OPTIONS:
+            if key in params:
+                options[key] = int(params[key])
+        for key in FLOAT_OPTIONS:
+            if key in params:
+                options[key] = float(params[key])
+        for key in FLAG_OPTIONS:
+            if key in params:
+                options[key] = params[key].lower() in ("1", "true", "yes")
+        unknown = set(params) - set(INT_OPTIONS) - set(FLOAT_OPTIONS) - set(FLAG_OPTIONS) - {"name"}
+        if unknown:
+            raise ValueError(f"unknown option(s): {', '.join(sorted(unknown))}")
+        if "target_mb" in options and "target_ssim" in options:
+            raise ValueError("target_ssim only applies without target_mb")
+        if options.get("allocate") and "target_mb" not in options:
+            raise ValueError("allocate requires target_mb")
+        return options
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: OptimizerService  # set on the subclass built by make_server()
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def do_GET(self) -> None:
+        path = urlparse(self.path).path
+        if path == "/healthz":
+            self._send(200, b"ok", "text/plain")
+        elif path == "/metrics":
+            svc = self.service
+            self._send_json(200, svc.metrics.snapshot(svc.workers, svc.max_queue))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/optimize":
+            self._send_json(404, {"error": "not found"})
+            return
+        svc = self.service
+        metrics = svc.metrics
+        t0 = time.perf_counter()
+        with metrics.lock:
+            metrics.counts["requests"] += 1
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > svc.max_upload_bytes:
+            self.close_connection = True  # body left unread
+            self._send_json(413 if length else 411, {"error": f"body must be 1..{svc.max_upload_bytes} bytes"})
+            with metrics.lock:
+                metrics.counts["errors"] += 1
+            return
+        data = self.rfile.read(length)
+        try:
+            options = svc.options_from_query(url.query)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            with metrics.lock:
+                metrics.counts["errors"] += 1
+            return
+
+        if not svc.slots.acquire(blocking=False):
+            with metrics.lock:
+                metrics.counts["rejected"] += 1
+            self._send_json(503, {"error": "queue full"}, {"Retry-After": "1"})
+            return
+        try:
+            with metrics.lock:
+                metrics.in_flight += 1
+            name = Path(parse_qs(url.query).get("name", ["upload.vrm"])[-1]).name
+            fut = svc.pool.submit(optimize_bytes, data, name, options)
+            try:
+                out, stats = fut.result()
+            except BaseException as e:  # SystemExit from the optimizer included
+                with metrics.lock:
+                    metrics.counts["errors"] += 1
+                self._send_json(422, {"error": f"{type(e).__name__}: {e}"})
+                return
+        finally:
+            with metrics.lock:
+                metrics.in_flight -= 1
+            svc.slots.release()
+
+        latency = (time.perf_counter() - t0) * 1000
+        with metrics.lock:
+            metrics.counts["ok"] += 1
+            metrics.latencies_ms.append(latency)
+            metrics.queue_ms.append(max(0.0, latency - stats["worker_ms"]))
+        stats["latency_ms"] = round(latency, 3)
+
+        if "application/json" in (self.headers.get("Accept") or ""):
+            self._send_json(200, {"stats": stats, "glb_base64": base64.b64encode(out).decode("ascii")})
+            return
+        summary = {k: v for k, v in stats.items() if k != "report"}
+        self._send(200, out, "model/gltf-binary", {"X-Optimizer-Stats": json.dumps(summary)})
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: OptimizerService, host: str = "127.0.0.1", port: int = 8787, unix: Path | None = None):
+    """HTTP server bound to host:port, or to the Unix socket `unix`."""
+    handler = type("Handler", (_Handler,), {"service": service})
+    if unix is not None:
+        unix.unlink(missing_ok=True)
+        return _UnixHTTPServer(str(unix), handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Serve vrm_optimizer over HTTP with a warm worker pool.")
+    p.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    p.add_argument("--port", type=int, default=8787, help="TCP port (default: 8787)")
+    p.add_argument("--unix", type=Path, default=None, help="Serve on this Unix socket instead of TCP.")
+    p.add_argument("--workers", type=int, default=0, help="Worker processes (0 = all cores, default: 0).")
+    p.add_argument(
+        "--max-queue",
+        type=int,
+        default=8,
+        help="Requests allowed to wait for a worker before new ones get 503 (default: 8).",
+    )
+    p.add_argument("--max-upload-mb", type=float, default=64, help="Largest accepted upload (default: 64).")
+    for key, value in DEFAULT_SETTINGS.items():
+        p.add_argument(f"--{key.replace('_', '-')}", type=int, default=value, help=f"Default {key} (default: {value})")
+    args = p.parse_args()
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    defaults = {key: getattr(args, key) for key in DEFAULT_SETTINGS}
+    service = OptimizerService(workers, args.max_queue, int(args.max_upload_mb * 1024 * 1024), defaults)
+    server = make_server(service, args.host, args.port, args.unix)
+    where = args.unix if args.unix is not None else f"http://{args.host}:{server.server_address[1]}"
+    print(f"Serving on {where} with {workers} worker(s), queue {args.max_queue}.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.unix is not None:
+            args.unix.unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())